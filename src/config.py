@@ -12,6 +12,16 @@ batch_size = 32
 # Annotation for the class labels
 class_labels = ['ACTUAL FACE', 'MIXED UP FACE']
 
+# Number of threads loading batches in parallel to the model and the
+#   number of batches they may prepare in advance
+workers = os.cpu_count()
+max_queue_size = 10
+
+# Number of threads augmenting the training batches, the augmentation
+#   is reproducible for a given seed, independent of the number of workers
+train_workers = min(4, os.cpu_count())
+seed = 42
+
 ############################################################
 # Output paths
 ############################################################
@@ -19,9 +29,37 @@ checkpoint_path = 'checkpoints'
 output_path = 'output'
 ilp_path = os.path.sep.join([base_path, output_path, 'ilp'])
 ilp_img_path = os.path.sep.join([ilp_path, 'images'])
+# the selected images as a list of test set files, see
+#   data_loaders.selection
+selection_path = os.path.sep.join([ilp_path, 'selection.json'])
 heatmap_path = os.path.sep.join([ilp_path, 'deep_taylor_images'])
+# raw relevance values of the heatmaps as a memory mapped array,
+#   with one subdirectory per analyzer method
+relevance_root = os.path.sep.join([ilp_path, 'relevance'])
+relevance_path = os.path.sep.join([relevance_root, 'deep_taylor'])
 annotation_path = os.path.sep.join([ilp_path, 'annotations'])
 pickle_path = os.path.sep.join([ilp_path, 'pickles'])
+# append-only store of the parsed samples, without file extension
+sample_store_path = os.path.sep.join([pickle_path, 'samples'])
+# all samples as a columnar SampleCollection
+sample_collection_path = os.path.sep.join([pickle_path, 'samples.npz'])
+cache_path = os.path.sep.join([base_path, output_path, 'cache'])
+
+# index of the image files in the dataset directories
+manifest_path = os.path.sep.join([cache_path, 'manifest.json'])
+
+# cached relevance maps, reused as long as model weights and images are
+#   unchanged. The least recently used maps are removed above the max size
+heatmap_cache_path = os.path.sep.join([cache_path, 'heatmaps'])
+heatmap_cache_size = 2 * 1024**3  # bytes
+
+# output of the frozen vgg16 base for training only the head
+feature_cache_path = os.path.sep.join([cache_path, 'features'])
+
+# decoded and resized images of the train, validation and test split,
+#   rebuilt when files in the dataset directories change
+cache_datasets = False
+dataset_cache_path = os.path.sep.join([cache_path, 'datasets'])
 
 # set the path to the serialized model after training
 vgg_path = os.path.sep.join(['output', 'models', 'vgg.model'])
@@ -34,6 +72,25 @@ val = os.path.sep.join([base_path, 'datasets', 'val'])
 # training data path for valiating the generated hypothesis
 predicate_picasso = os.path.sep.join([base_path, 'datasets', 'predicate_picasso'])
 
+############################################################
+# Heatmapping
+############################################################
+
+# iNNvestigate analyzers to create heatmaps with. All of them are run
+#   on the same batches, deep_taylor is used for the ilp knowledge
+analyzer_methods = ['deep_taylor']
+
+# keyword arguments for the analyzers by method name,
+#   e.g. {'lrp.alpha_beta': {'alpha': 1, 'beta': 0}}
+analyzer_params = {}
+
+# how the heatmap images are rendered: 'matplotlib' draws a figure per
+#   image like the images the existing annotations were made on, 'lut'
+#   maps the relevance with a colormap lookup table, which is much faster
+#   but writes the maps unpadded at the analyzer resolution. Only switch
+#   to 'lut' for new annotations, the boxes of the old ones do not match
+render_backend = 'matplotlib'
+
 ############################################################
 # ILP Knowedlge Generation
 ############################################################
@@ -41,6 +98,32 @@ predicate_picasso = os.path.sep.join([base_path, 'datasets', 'predicate_picasso'
 # the number of samples per ilp class
 n_ilp_samples = 50
 
+# how the samples of a class are selected from the test predictions:
+#   'boundary', 'stratified' (by confidence bins) or 'random',
+#   see ilp.sample_data.select
+selection_strategy = 'boundary'
+selection_bins = 5
+# how the selection is stored: 'manifest' only lists the test set files in
+#   selection_path, 'hardlink' and 'symlink' additionally link them into
+#   ilp_img_path, 'copy' copies them there
+selection_mode = 'manifest'
+
+# automatic annotation with generate_proposals.py: connected regions with at
+#   least proposal_threshold * maximum relevance of a heatmap, joined by a
+#   closing with a square kernel, become region objects
+proposal_threshold = 0.3
+proposal_kernel_size = 5
+proposal_min_area = 16
+proposal_max_regions = 10
+
+# number of processes reading the annotation files
+annotation_workers = os.cpu_count()
+
+# (height, width) of the relevance maps, the bounding boxes of the samples
+#   are in its pixels. Annotations of heatmap images with another size,
+#   e.g. matplotlib figures, are scaled to it
+annotation_size = (224, 224)
+
 # percentage of images that should be correctly classified
 # as negative in evaluate_hypothesis
 validation_threshold = 95
@@ -55,6 +138,26 @@ Documentation:
     https://www.cs.ox.ac.uk/activities/programinduction/Aleph/aleph.html#SEC45
 """
 
+# Predicates written to the background knowledge, in the order of the modes
+#   and determinations, see ilp.structures.predicates. 'relevant' needs the
+#   relevance maps written by generate_heatmaps.py
+aleph_predicates = ['face', 'has_a', 'is_a', 'contains', 'intersects',
+                    'disjoint', 'overlaps', 'left_of', 'top_of']
+# Modules registering additional predicates, e.g. 'ilp.my_predicates'
+predicate_modules = []
+# How facts of symmetric predicates (e.g. intersects) are written:
+#   'both': for both orders of every pair
+#   'once': only once per unordered pair, clauses only match the order
+#       of the written fact
+#   'rule': once per pair as name_fact and rules deriving both orders.
+#       This halves the symmetric facts of the file, aleph still tries
+#       both orders through the rules, so the search is the same as 'both'
+symmetric_facts = 'both'
+# Name further parts of the same kind in a sample with a number, e.g.
+#   pos_01region1 after pos_01region. Otherwise they share one atom, which
+#   merges e.g. the regions of generate_proposals.py into a single part
+number_parts = False
+
 aleph_settings = [':- use_module(library(lists)).',
                   # Upper bound of layers for new variables
                   ':- set(i, 5).',
@@ -0,0 +1,103 @@
+"""Cache the decoded images of a dataset split
+
+The images of a split are decoded and resized once into a uint8 array
+that is memory mapped on later runs, together with the labels, the
+filenames and the class indices. The cache is rebuilt as soon as the
+modification time of one of the split's directories changes, i.e. when
+files have been added, removed or renamed.
+"""
+
+import os
+import json
+
+import keras
+import numpy as np
+from tqdm import tqdm
+
+from data_loaders.manifest import DatasetManifest
+
+
+class DatasetCache():
+
+    def __init__(self, path, target_size=(224, 224), manifest=None):
+        """
+        Parameters
+        ----------
+        path : str
+            Directory to store the cached splits in
+
+        manifest : DatasetManifest
+            Index of the dataset files, loaded if not given
+        """
+        self.path = path
+        self.target_size = tuple(target_size)
+        self.manifest = manifest or DatasetManifest()
+
+    def paths(self, name):
+        """Paths of the images, labels and index of a split"""
+        base = os.path.sep.join([self.path, name])
+        return base + '_images.npy', base + '_labels.npy', base + '_index.json'
+
+    def load(self, name, directory):
+        """Memory map a cached split, None if missing or outdated"""
+
+        images_path, labels_path, index_path = self.paths(name)
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+            if index['mtimes'] != self.manifest.mtimes(directory):
+                return None
+            images = np.load(images_path, mmap_mode='r')
+            labels = np.load(labels_path)
+        except (FileNotFoundError, ValueError, OSError, KeyError):
+            return None
+
+        return images, labels, index['filenames'], index['class_indices']
+
+    def build(self, name, directory):
+        """Decode all images of a split into the cache"""
+
+        os.makedirs(self.path, exist_ok=True)
+        images_path, labels_path, index_path = self.paths(name)
+
+        # remove the index first, so an interrupted build is not used
+        if os.path.isfile(index_path):
+            os.remove(index_path)
+
+        mtimes = self.manifest.mtimes(directory)
+        filenames, labels, class_indices = self.manifest.classes(directory)
+
+        print(f'[*] Caching {len(filenames)} {name} images')
+        images = np.lib.format.open_memmap(
+            images_path,
+            mode='w+',
+            dtype=np.uint8,
+            shape=(len(filenames),) + self.target_size + (3,))
+
+        for i, filename in enumerate(tqdm(filenames)):
+            img = keras.preprocessing.image.load_img(
+                os.path.join(directory, filename),
+                target_size=self.target_size)
+            images[i] = np.asarray(img, dtype=np.uint8)
+        images.flush()
+        del images
+
+        np.save(labels_path, np.asarray(labels, dtype=np.int32))
+        with open(index_path, 'w') as f:
+            json.dump({'mtimes': mtimes,
+                       'filenames': filenames,
+                       'class_indices': class_indices}, f)
+
+        return self.load(name, directory)
+
+    def get(self, name, directory):
+        """Return images, labels, filenames and class indices of a split,
+        decoding the images only if the cache is missing or outdated"""
+
+        cached = self.load(name, directory)
+        if cached is None:
+            cached = self.build(name, directory)
+        else:
+            print(f'[+] Loaded {len(cached[2])} cached {name} images')
+
+        return cached
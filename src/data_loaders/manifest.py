@@ -0,0 +1,152 @@
+"""Persistent index of the image files in the dataset directories
+
+A single scan records the image files with their sizes for every
+directory. On later runs only the modification time of each directory is
+checked, and only directories whose content changed are listed again, so
+counting the images and creating the flows does not walk the whole
+dataset every time.
+"""
+
+import os
+import json
+
+import config
+
+# same extensions as imutils.paths.list_images
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+class DatasetManifest():
+
+    def __init__(self, path=config.manifest_path):
+        """Load the manifest
+
+        Parameters
+        ----------
+        path : str
+            json file the manifest is stored in
+        """
+
+        self.path = path
+        # directories refreshed by this instance, they are not checked again
+        self.refreshed = set()
+
+        try:
+            with open(self.path) as f:
+                self.roots = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.roots = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        # write to a temporary file, so the manifest is never incomplete
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.roots, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def scan(directory, mtime):
+        """List the subdirectories and image files of a single directory"""
+
+        dirs = []
+        files = []
+        for item in os.scandir(directory):
+            if item.is_dir():
+                dirs.append(item.name)
+            elif item.name.lower().endswith(IMAGE_EXTENSIONS):
+                files.append([item.name, item.stat().st_size])
+
+        return {'mtime': mtime, 'dirs': sorted(dirs), 'files': sorted(files)}
+
+    def refresh(self, directory):
+        """Bring the entries of a directory tree up to date
+
+        Returns
+        -------
+        entries : dict
+            Entry with mtime, subdirectories and files (name, size) for
+            each directory, keyed by the path relative to directory
+        """
+
+        root = os.path.abspath(directory)
+        if root in self.refreshed:
+            return self.roots[root]
+
+        previous = self.roots.get(root, {})
+        entries = {}
+        changed = False
+
+        pending = ['.']
+        while pending:
+            rel_dir = pending.pop()
+            try:
+                mtime = os.stat(os.path.join(root, rel_dir)).st_mtime_ns
+            except FileNotFoundError:
+                continue
+
+            entry = previous.get(rel_dir)
+            if entry is None or entry['mtime'] != mtime:
+                entry = self.scan(os.path.join(root, rel_dir), mtime)
+                changed = True
+
+            entries[rel_dir] = entry
+            pending += [name if rel_dir == '.' else os.path.join(rel_dir, name)
+                        for name in entry['dirs']]
+
+        self.roots[root] = entries
+        self.refreshed.add(root)
+        if changed or entries.keys() != previous.keys():
+            self.save()
+
+        return entries
+
+    def files(self, directory):
+        """Return (path relative to directory, size) for all images"""
+
+        entries = self.refresh(directory)
+        files = []
+        for rel_dir in sorted(entries):
+            for name, size in entries[rel_dir]['files']:
+                path = name if rel_dir == '.' else os.path.join(rel_dir, name)
+                files.append((path, size))
+
+        return files
+
+    def count(self, directory):
+        """Number of images in a directory tree"""
+        return sum(len(entry['files'])
+                   for entry in self.refresh(directory).values())
+
+    def mtimes(self, directory):
+        """Modification time of every directory in the tree"""
+        return {rel_dir: entry['mtime']
+                for rel_dir, entry in self.refresh(directory).items()}
+
+    def classes(self, directory):
+        """Return filenames relative to directory, labels and class indices
+
+        Classes are the sorted subdirectories and files are ordered like in
+        flow_from_directory, images directly in directory are ignored.
+        """
+
+        entries = self.refresh(directory)
+        names = entries['.']['dirs'] if '.' in entries else []
+        class_indices = {name: index for index, name in enumerate(names)}
+
+        filenames = []
+        labels = []
+        for path, size in self.files(directory):
+            name = path.split(os.path.sep)[0]
+            if name in class_indices:
+                filenames.append(path)
+                labels.append(class_indices[name])
+
+        # files() is sorted by directory, so the files of a class are
+        #   already grouped, a stable sort keeps the order within a class
+        order = sorted(range(len(filenames)), key=lambda i: labels[i])
+
+        return ([filenames[i] for i in order],
+                [labels[i] for i in order],
+                class_indices)
@@ -2,25 +2,39 @@ import os
 
 import keras
 import numpy as np
-from imutils import paths
 
 import config
+from data_loaders.dataset_cache import DatasetCache
+from data_loaders.manifest import DatasetManifest
+from data_loaders.sequences import ImageSequence, CachedImageSequence
 
 class PicassoLoader():
     """ Loads the Picasso Dataset from harddrive, creates generators and
     tensorflow flows"""
 
-    def __init__(self):
+    def __init__(self, cache=config.cache_datasets):
+        """
+        Parameters
+        ----------
+        cache : bool
+            Decode the images of each split once into a memory mapped
+            DatasetCache and create the flows from it
+        """
+
+        self.cache = cache
 
         # Construct path for the dataset
         self.train_path = os.path.sep.join([config.base_path, config.train])
         self.val_path = os.path.sep.join([config.base_path, config.val])
         self.test_path = os.path.sep.join([config.base_path, config.test])
 
+        # Index of the dataset files, shared by the counts and the flows
+        self.manifest = DatasetManifest()
+
         # Store statistics about the training data
-        self.n_train = len(list(paths.list_images(self.train_path)))
-        self.n_validation = len(list(paths.list_images(self.val_path)))
-        self.n_test = len(list(paths.list_images(self.test_path)))
+        self.n_train = self.manifest.count(self.train_path)
+        self.n_validation = self.manifest.count(self.val_path)
+        self.n_test = self.manifest.count(self.test_path)
 
         self.info = {'n_train': self.n_train,
                 'n_validation': self.n_validation,
@@ -64,34 +78,98 @@ class PicassoLoader():
 
 
     def get_data_flows(self):
+        if self.cache:
+            return self.get_cached_flows()
+
         # Load data from harddrive, so it doesnt have to be stored in ram
-        #   offered by the flow_from_directory
-        #   these are generators, yielding the relevant samples
-        print('[+] Got training examples:')
-        training = self.train_augment.flow_from_directory(
-            self.train_path,
-            class_mode='binary',
-            target_size=(224, 224),
-            color_mode='rgb',
-            shuffle=True,
-            batch_size=config.batch_size)
-
-        print('[+] Got validation examples:')
-        validation = self.val_augment.flow_from_directory(
-            self.val_path,
-            class_mode='binary',
-            target_size=(224, 224),
-            color_mode='rgb',
-            shuffle=False,
-            batch_size=config.batch_size)
-
-        print('[+] Got test examples:')
-        test = self.val_augment.flow_from_directory(
-            self.test_path,
-            class_mode='binary',
-            target_size=(224, 224),
-            color_mode='rgb',
-            shuffle=False,
-            batch_size=config.batch_size)
+        #   these are sequences, yielding the relevant samples
+        training = self.get_training_flow()
+
+        validation = self.get_flow(self.val_path)
+        print(f'[+] Got {validation.samples} validation examples')
+
+        test = self.get_flow(self.test_path)
+        print(f'[+] Got {test.samples} test examples')
 
         return training, validation, test, self.info
+
+    def get_flow(self, path):
+        """Return the unshuffled examples of a directory without
+        augmentation, the subdirectories are the classes"""
+
+        filenames, labels, class_indices = self.manifest.classes(path)
+
+        return ImageSequence(filenames,
+                             labels,
+                             directory=path,
+                             class_indices=class_indices,
+                             batch_size=config.batch_size)
+
+    def get_training_flow(self):
+        """Return the augmented training examples
+
+        The batches are created independently and reproducibly from
+        config.seed, so they can be augmented by a pool of worker
+        threads (config.train_workers)
+        """
+
+        filenames, labels, class_indices = self.manifest.classes(self.train_path)
+        print(f'[+] Got {len(filenames)} training examples')
+
+        return ImageSequence(filenames,
+                             labels,
+                             directory=self.train_path,
+                             class_indices=class_indices,
+                             batch_size=config.batch_size,
+                             augment=self.train_augment,
+                             shuffle=True,
+                             seed=config.seed)
+
+    def get_cached_flows(self):
+        """Create the flows from the decoded images of a DatasetCache
+
+        The validation and test flows read their batches straight from the
+        cache, the training flow applies the augmentation on top.
+        """
+
+        cache = DatasetCache(config.dataset_cache_path, manifest=self.manifest)
+        flows = []
+
+        for name, path in [('train', self.train_path),
+                           ('validation', self.val_path),
+                           ('test', self.test_path)]:
+
+            images, labels, filenames, class_indices = cache.get(name, path)
+            train = name == 'train'
+
+            flow = CachedImageSequence(
+                images,
+                filenames,
+                labels,
+                directory=path,
+                class_indices=class_indices,
+                batch_size=config.batch_size,
+                augment=self.train_augment if train else None,
+                shuffle=train,
+                seed=config.seed)
+
+            print(f'[+] Got {flow.samples} {name} examples')
+            flows.append(flow)
+
+        training, validation, test = flows
+
+        return training, validation, test, self.info
+
+    def get_feature_flow(self):
+        """Return the training examples without augmentation and shuffling,
+        used to compute features of the frozen base once"""
+        if self.cache:
+            images, labels, filenames, class_indices = DatasetCache(
+                config.dataset_cache_path,
+                manifest=self.manifest).get('train', self.train_path)
+            return CachedImageSequence(images, filenames, labels,
+                                       directory=self.train_path,
+                                       class_indices=class_indices)
+
+        print('[+] Got training examples for feature extraction')
+        return self.get_flow(self.train_path)
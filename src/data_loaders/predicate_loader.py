@@ -1,15 +1,14 @@
 import os
 
-import keras
 import numpy as np
-from imutils import paths
 
-import config
+from data_loaders.manifest import DatasetManifest
+from data_loaders.sequences import ImageSequence
 
 
 class PredicateTestLoader():
-    """ Loads the customized Picasso Dataset for hypothesis test from harddrive,
-        creates generators and tensorflow flows
+    """ Loads the customized Picasso Dataset for hypothesis test from harddrive
+        and creates a single flow over the images of all sets
     """
 
     def __init__(self, config):
@@ -17,8 +16,10 @@ class PredicateTestLoader():
         # Get all the folders in predicates_path
         # each of which has data for one predicate to test
         self.sets = []
+        self.path = config.predicate_picasso
+        manifest = DatasetManifest()
 
-        for item in os.listdir(config.predicate_picasso):
+        for item in sorted(os.listdir(config.predicate_picasso)):
             full_path = os.path.join(config.predicate_picasso, item)
 
             # Use only the folder
@@ -26,51 +27,37 @@ class PredicateTestLoader():
 
                 dir = full_path  # directory containg samples
                 name = os.path.basename(full_path)  # e.g. not_has_nose
-                n_images = len(list(paths.list_images(dir)))
+                files = [os.path.join(dir, f) for f, size in manifest.files(dir)]
 
                 set = {'name': name,
                         'path': dir,
-                        'n_images': n_images,
-                        'generator': None}
+                        'n_images': len(files),
+                        'files': files}
 
                 self.sets.append(set)
 
-        self.create_augmentations()
+    def get_interleaved_flow(self):
+        """Return a single flow over the images of all sets
 
-    def create_augmentations(self):
-
-        # Augmentation for the validation data with only mean substraction
-        val_augment = keras.preprocessing.image.ImageDataGenerator(
-            preprocessing_function=keras.applications.vgg16.preprocess_input
-        )
-
-        # ImageNet mean subtraction (in RGB order) and set the
-        # might be unneccesarry
-        IMAGENET_MEAN = np.array([103.939, 116.779, 123.68], dtype="float32")
-        val_augment.mean = IMAGENET_MEAN
-        self.val_augment = val_augment
-
-
-    def get_data_flows(self):
-        """Return the datasets for the hypothesis validation
+        The images of all sets are concatenated, so batches are filled
+        across set boundaries. Each image is tagged with the index of its
+        set in self.sets.
 
         Return
         ------
-        sets : list
-            List of dictionaries with name, path, number of images and
-            generator (flow) for each hypothesis validation set
+        flow : ImageSequence
+            Sequence with a tag per image, all images are labeled negative
         """
 
-        for set in self.sets:
-
-            generator = self.val_augment.flow_from_directory(
-                    set['path'],
-                    class_mode='binary',
-                    target_size=(224, 224),
-                    color_mode='rgb',
-                    shuffle=False,
-                    batch_size=config.batch_size)
+        filenames = []
+        tags = []
+        for index, set in enumerate(self.sets):
+            filenames += [os.path.relpath(f, self.path) for f in set['files']]
+            tags += [index] * set['n_images']
 
-            set['generator'] = generator
+        print(f'[+] Found {len(filenames)} images in {len(self.sets)} sets')
 
-        return self.sets
+        return ImageSequence(filenames,
+                             classes=np.zeros(len(filenames)),
+                             directory=self.path,
+                             tags=tags)
@@ -0,0 +1,135 @@
+"""The images selected for heatmapping
+
+The selection lists the chosen test set files per class instead of copying
+them, so selecting images neither reads nor writes image data. Each image
+keeps the name it would have in the class folders of ilp_img_path, e.g.
+pos/neg_pic_00046.png for the test file neg/pic_00046.png, which is used
+to name its heatmap.
+
+The folders can still be created for tools that expect them, as hardlinks
+or symlinks to the test set files or as copies (see link).
+"""
+
+import os
+import json
+import shutil
+
+import config
+from helpers.img import path_to_name
+
+MODES = ('manifest', 'hardlink', 'symlink', 'copy')
+
+
+class Selection():
+
+    def __init__(self, path=config.selection_path):
+        """Load the selection
+
+        Parameters
+        ----------
+        path : str
+            json file the selection is stored in
+        """
+
+        self.path = path
+
+        try:
+            with open(self.path) as f:
+                content = json.load(f)
+        except (FileNotFoundError, ValueError):
+            content = {}
+
+        self.source = content.get('source', config.test)
+        # list of [name, path relative to source] per class
+        self.images = content.get('images', {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        # write to a temporary file, so the selection is never incomplete
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'source': self.source, 'images': self.images}, f)
+        os.replace(tmp_path, self.path)
+
+    def set(self, selections, classes, source=config.test):
+        """Replace the selected images
+
+        Parameters
+        ----------
+        selections : Tuple
+            Tuple of lists of filenames relative to source, one per class
+
+        classes : List
+            Name of the class of each list
+        """
+
+        self.source = os.path.abspath(source)
+        self.images = {image_class: [[path_to_name(img), img] for img in images]
+                       for images, image_class in zip(selections, classes)}
+
+    def count(self):
+        """Number of selected images"""
+        return sum(len(images) for images in self.images.values())
+
+    def classes(self):
+        """Return filenames, labels, class indices and source paths
+
+        Filenames are relative to the class folders, classes are sorted and
+        the files of a class are sorted by name, like DatasetManifest.classes
+        for the folders of ilp_img_path.
+        """
+
+        class_indices = {name: index
+                         for index, name in enumerate(sorted(self.images))}
+
+        filenames = []
+        labels = []
+        paths = []
+        for image_class, index in class_indices.items():
+            for name, img in sorted(self.images[image_class]):
+                filenames.append(os.path.join(image_class, name))
+                labels.append(index)
+                paths.append(os.path.join(self.source, img))
+
+        return filenames, labels, class_indices, paths
+
+    def link(self, directory=config.ilp_img_path, mode='hardlink'):
+        """Create the class folders with the selected images
+
+        Parameters
+        ----------
+        mode : str
+            'hardlink', 'symlink' or 'copy', hardlinks fall back to copies
+            when the directory is on another file system
+        """
+
+        if mode not in MODES[1:]:
+            raise ValueError(f'Unknown selection mode {mode}, '
+                             "use 'hardlink', 'symlink' or 'copy'")
+
+        for image_class, images in self.images.items():
+            path = os.path.sep.join([directory, image_class])
+            os.makedirs(path, exist_ok=True)
+
+            for name, img in images:
+                source = os.path.join(self.source, img)
+                target = os.path.sep.join([path, name])
+
+                # links fail for existing targets
+                if os.path.lexists(target):
+                    os.remove(target)
+
+                if mode == 'hardlink':
+                    try:
+                        os.link(source, target)
+                        continue
+                    except OSError:
+                        print(f'[!] Could not link into {directory}, '
+                              'copying the images instead')
+                        mode = 'copy'
+
+                if mode == 'symlink':
+                    os.symlink(source, target)
+                else:
+                    shutil.copy(source, target)
@@ -0,0 +1,251 @@
+"""Keras sequences that load batches of images from a list of files
+
+Unlike flow_from_directory, the images of a sequence can come from several
+directories and carry a tag per image, e.g. the dataset they belong to.
+Batches are created independently by index, so keras can load them on a
+pool of workers with a bounded prefetch queue
+(workers and max_queue_size of fit_generator and predict_generator).
+"""
+
+import os
+
+import keras
+import numpy as np
+
+import config
+
+
+def random_transform_parameters(augment, shape, random_state):
+    """Draw the transformation of an image from a local random state
+
+    Same parameters as ImageDataGenerator.get_random_transform with the
+    global random state seeded the same way, but without touching the
+    global random state, so images can be augmented by several threads.
+
+    Parameters
+    ----------
+    augment : keras.preprocessing.image.ImageDataGenerator
+
+    shape : tuple
+        Shape of the image
+
+    random_state : numpy.random.RandomState
+    """
+
+    def shift(shift_range, size):
+        if not shift_range:
+            return 0
+        try:  # 1-D array-like or int
+            value = random_state.choice(shift_range)
+            value *= random_state.choice([-1, 1])
+        except ValueError:  # floating point
+            value = random_state.uniform(-shift_range, shift_range)
+        if np.max(shift_range) < 1:
+            value *= size
+        return value
+
+    theta = random_state.uniform(-augment.rotation_range,
+                                 augment.rotation_range) \
+        if augment.rotation_range else 0
+    tx = shift(augment.height_shift_range, shape[augment.row_axis - 1])
+    ty = shift(augment.width_shift_range, shape[augment.col_axis - 1])
+    shear = random_state.uniform(-augment.shear_range, augment.shear_range) \
+        if augment.shear_range else 0
+
+    if augment.zoom_range[0] == 1 and augment.zoom_range[1] == 1:
+        zx, zy = 1, 1
+    else:
+        zx, zy = random_state.uniform(augment.zoom_range[0],
+                                      augment.zoom_range[1], 2)
+
+    flip_horizontal = (random_state.random_sample() < 0.5) \
+        * augment.horizontal_flip
+    flip_vertical = (random_state.random_sample() < 0.5) \
+        * augment.vertical_flip
+
+    channel_shift_intensity = None
+    if augment.channel_shift_range != 0:
+        channel_shift_intensity = random_state.uniform(
+            -augment.channel_shift_range, augment.channel_shift_range)
+
+    brightness = None
+    if augment.brightness_range is not None:
+        brightness = random_state.uniform(augment.brightness_range[0],
+                                          augment.brightness_range[1])
+
+    return {'theta': theta,
+            'tx': tx,
+            'ty': ty,
+            'shear': shear,
+            'zx': zx,
+            'zy': zy,
+            'flip_horizontal': flip_horizontal,
+            'flip_vertical': flip_vertical,
+            'channel_shift_intensity': channel_shift_intensity,
+            'brightness': brightness}
+
+
+class ImageSequence(keras.utils.Sequence):
+
+    def __init__(self,
+                 filenames,
+                 classes,
+                 directory='',
+                 batch_size=config.batch_size,
+                 tags=None,
+                 class_indices=None,
+                 target_size=(224, 224),
+                 preprocessing_function=keras.applications.vgg16.preprocess_input,
+                 augment=None,
+                 shuffle=False,
+                 seed=None,
+                 paths=None):
+        """Create a sequence over a list of image files
+
+        Parameters
+        ----------
+        filenames : list
+            Image paths relative to directory
+
+        classes : list
+            Binary label for each image
+
+        directory : str
+            Base path of the filenames
+
+        tags : list
+            Optional integer tag for each image, e.g. the index of the
+            dataset the image belongs to
+
+        augment : keras.preprocessing.image.ImageDataGenerator
+            If given, random transformations of the generator are applied
+            to each image before the preprocessing function
+
+        shuffle : bool
+            Shuffle the order of the images after every epoch
+
+        seed : int
+            Makes shuffling and augmentation reproducible. The random state
+            of a batch only depends on the seed, the epoch and the batch
+            index, so it does not matter which worker creates the batch
+
+        paths : list
+            Optional path of each image file to load instead of
+            directory/filename, e.g. the test set files of a selection,
+            the filenames then only name the images
+        """
+
+        self.directory = directory
+        self.filenames = list(filenames)
+        self.paths = None if paths is None else list(paths)
+        self.classes = np.asarray(classes, dtype=np.int32)
+        self.tags = None if tags is None else np.asarray(tags)
+        self.class_indices = class_indices or {}
+        self.samples = len(self.filenames)
+        self.batch_size = batch_size
+        self.target_size = tuple(target_size)
+        self.preprocessing_function = preprocessing_function
+        self.augment = augment
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.index_array = np.arange(self.samples)
+        self.batch_index = 0
+
+        if self.shuffle:
+            self.random_state().shuffle(self.index_array)
+
+    def __len__(self):
+        return int(np.ceil(self.samples / self.batch_size))
+
+    @property
+    def filepaths(self):
+        if self.paths is not None:
+            return list(self.paths)
+        return [os.path.join(self.directory, filename)
+                for filename in self.filenames]
+
+    def random_state(self, *keys):
+        """Random state for the current epoch and the given keys"""
+        if self.seed is None:
+            return np.random.RandomState()
+        return np.random.RandomState([self.seed, self.epoch, *keys])
+
+    def load(self, index_array):
+        """Decode the images with the given indices into a float32 batch"""
+
+        x = np.empty((len(index_array),) + self.target_size + (3,),
+                     dtype=np.float32)
+
+        for i, j in enumerate(index_array):
+            path = self.paths[j] if self.paths is not None \
+                else os.path.join(self.directory, self.filenames[j])
+            img = keras.preprocessing.image.load_img(
+                path, target_size=self.target_size)
+            x[i] = keras.preprocessing.image.img_to_array(img)
+
+        return x
+
+    def __getitem__(self, index):
+        index_array = self.index_array[index * self.batch_size:
+                                       (index + 1) * self.batch_size]
+        x = self.load(index_array)
+
+        if self.augment is not None:
+            # the parameters are drawn from a random state per image, so
+            #   batches can be created by several threads
+            seeds = self.random_state(index).randint(2**31 - 1, size=len(x))
+            for i in range(len(x)):
+                seed = None if self.seed is None else seeds[i]
+                params = random_transform_parameters(
+                    self.augment, x[i].shape, np.random.RandomState(seed))
+                x[i] = self.augment.apply_transform(x[i], params)
+
+        if self.preprocessing_function is not None:
+            x = self.preprocessing_function(x)
+
+        return x, self.classes[index_array].astype(np.float32)
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        if self.shuffle:
+            self.index_array = np.arange(self.samples)
+            self.random_state().shuffle(self.index_array)
+
+    # Iterator interface of the keras directory iterators, used by
+    #   code that consumes the batches one by one
+    def reset(self):
+        self.batch_index = 0
+
+    def next(self):
+        batch = self[self.batch_index]
+        self.batch_index = (self.batch_index + 1) % len(self)
+        return batch
+
+    def __next__(self):
+        return self.next()
+
+
+class CachedImageSequence(ImageSequence):
+    """Sequence over images that have already been decoded into an array,
+    e.g. the memory mapped splits of a DatasetCache"""
+
+    def __init__(self, images, filenames, classes, **kwargs):
+        """
+        Parameters
+        ----------
+        images : numpy.ndarray
+            uint8 images with shape (n, height, width, 3) in the order of
+            filenames
+        """
+        super().__init__(filenames, classes,
+                         target_size=images.shape[1:3], **kwargs)
+        self.images = images
+
+    def load(self, index_array):
+        # memory mapped arrays read rows fastest in ascending order
+        order = np.argsort(index_array)
+        x = np.empty((len(index_array),) + self.images.shape[1:],
+                     dtype=np.float32)
+        x[order] = self.images[index_array[order]]
+        return x
@@ -10,50 +10,103 @@
 """
 
 import numpy as np
+import pandas as pd
 
 from models.vgg import VGGFinetune
 from data_loaders.predicate_loader import PredicateTestLoader
+from helpers.predict import predict
 import config
 
 
-def eval_hypothesis(config):
-    vgg = VGGFinetune().model
+def summarize(name, predictions, threshold):
+    """Count the predictions for one predicate test set
 
-    # Get data flows
-    loader = PredicateTestLoader(config)
-    sets = loader.get_data_flows()
+    Parameters
+    ----------
+    name : str
+        Name of the set, e.g. not_has_nose
 
-    # Load the pretrained model
-    vgg = VGGFinetune().model
+    predictions : numpy.ndarray
+        Output of the model for all images in the set
 
-    for set in sets:
+    threshold : float
+        Minimum percentage of negative predictions for the predicate to pass
+
+    Returns
+    -------
+    result : dict
+        One row of the result table
+    """
+
+    rounded_predictions = np.rint(predictions)
+    n_images = len(rounded_predictions)
+
+    pos_predictions = int(np.sum(rounded_predictions == 1))
+    neg_predictions = int(np.sum(rounded_predictions == 0))
+
+    # images predicted to be negative, which by construction
+    # of the dataset is the correct label for all images
+    neg_percentage = (neg_predictions / n_images) * 100 if n_images else 0.
+
+    # if wrong predictions exceed a certain threshold, the predicate
+    # does not accurately describe the dataset
+    return {'name': name,
+            'n_images': n_images,
+            'positive': pos_predictions,
+            'negative': neg_predictions,
+            'neg_percentage': neg_percentage,
+            'passed': neg_percentage >= threshold}
 
-        print(f'[*] Evaluating {set["name"]} with {set["n_images"]} images')
-        steps = (set['n_images'] // config.batch_size) + 1
-        predictions = vgg.predict_generator(set['generator'], steps=steps)
-        print(f'[+] Got predictions')
 
-        rounded_predictions = np.rint(predictions)
+def eval_hypothesis(config, model=None):
+    """Predict all predicate test sets with a single model
 
-        pos_predictions = np.sum(rounded_predictions == 1)
-        neg_predictions = np.sum(rounded_predictions == 0)
+    Parameters
+    ----------
+    model : keras.Model
+        Picasso Dataset pretrained keras model, loaded if not given
 
-        print(f'[*] Positive predictions: {pos_predictions}')
-        print(f'[*] Negative predictions: {neg_predictions}')
+    Returns
+    -------
+    results : pandas.DataFrame
+        One row per predicate test set with the number of images, positive
+        and negative predictions, the percentage of negative predictions
+        and whether the predicate passed the config.validation_threshold
+    """
 
-        # images predicted to be negative, which by construction
-        # of the dataset is the correct label for all images
-        neg_percentage = (neg_predictions / len(rounded_predictions)) * 100
+    # Load the pretrained model
+    if model is None:
+        model = VGGFinetune().model
+
+    # A single flow over all sets, tagged with the set of each image
+    loader = PredicateTestLoader(config)
+    flow = loader.get_interleaved_flow()
+
+    # the images are decoded by a pool of workers while the model predicts
+    predictions = predict(model, flow)
+
+    results = []
+    for index, set in enumerate(loader.sets):
+
+        print(f'[*] Evaluating {set["name"]} with {set["n_images"]} images')
+        result = summarize(set['name'],
+                           predictions[flow.tags == index],
+                           config.validation_threshold)
+        results.append(result)
 
-        # if wrong predictions exceed a certain threshold, the predicate
-        # does not accurately describe the dataset
-        if neg_percentage < config.validation_threshold:
-            print(f'[-] Predicate failed with {neg_percentage}% \n')
+        print(f'[*] Positive predictions: {result["positive"]}')
+        print(f'[*] Negative predictions: {result["negative"]}')
 
+        if result['passed']:
+            print(f'[-] Predicate passed with {result["neg_percentage"]}% \n')
         else:
-            print(f'[-] Predicate passed with {neg_percentage}% \n')
+            print(f'[-] Predicate failed with {result["neg_percentage"]}% \n')
 
+    return pd.DataFrame(results, columns=['name', 'n_images', 'positive',
+                                          'negative', 'neg_percentage',
+                                          'passed'])
 
 
 if __name__ == "__main__":
-    eval_hypothesis(config)
+    results = eval_hypothesis(config)
+    print(results)
@@ -9,15 +9,16 @@
  """
 
 import os
+import sys
 import argparse
 
-import keras
-from imutils import paths
-
 from ilp import sample_data
-from heatmapping.deep_taylor import DeepTaylor
+from heatmapping.analyzer_set import AnalyzerSet
 from models.vgg import VGGFinetune
 from data_loaders.picasso_loader import PicassoLoader
+from data_loaders.manifest import DatasetManifest
+from data_loaders.selection import Selection
+from data_loaders.sequences import ImageSequence
 import config
 
 parser = argparse.ArgumentParser(description='Select images and create heatmaps')
@@ -37,6 +38,34 @@ parser.add_argument('--only_correct', default=False, type=bool,
                           'containing all false positives and false negatives.')
                     )
 
+parser.add_argument('--strategy', default=config.selection_strategy,
+                    choices=['boundary', 'stratified', 'random'],
+                    help=('How to select the images of a class: closest to '
+                          'the descision boundary, stratified by confidence '
+                          'or random.')
+                    )
+
+parser.add_argument('--mode', default=config.selection_mode,
+                    choices=['manifest', 'hardlink', 'symlink', 'copy'],
+                    help=('How to store the selected images: only as a list '
+                          'of the test set files, or additionally as '
+                          'hardlinks, symlinks or copies in the class '
+                          'folders of the images directory.')
+                    )
+
+parser.add_argument('--no_cache', dest='cache', action='store_false',
+                    help=('Analyze all images again instead of loading the '
+                          'heatmaps of images that have already been '
+                          'analyzed with the same model weights from the '
+                          'heatmap cache.')
+                    )
+
+parser.add_argument('--methods', default=config.analyzer_methods, nargs='+',
+                    help=('iNNvestigate analyzers to create heatmaps with, '
+                          'e.g. deep_taylor lrp.z lrp.alpha_beta gradient. '
+                          'All methods are run on the same batches.')
+                    )
+
 
 def load_data():
     """Load the test data to select from"""
@@ -45,40 +74,45 @@ def load_data():
 
 
 def selection_generator():
-    """Flow for the selected images"""
-
-    augment = keras.preprocessing.image.ImageDataGenerator(
-        preprocessing_function=keras.applications.vgg16.preprocess_input
-    )
-
-    data = augment.flow_from_directory(
-        config.ilp_img_path,
-        class_mode='binary',
-        target_size=(224, 224),
-        color_mode='rgb',
-        shuffle=False,
-        batch_size=10)
-    # in case of a filenumber % 10 = 0, an even number of steps for the
-    #   analyzer can be used with this
+    """Flow for the selected images, read from the test set files of the
+    selection or from the folders of older selections"""
+
+    selection = Selection()
+    if selection.count():
+        filenames, labels, class_indices, paths = selection.classes()
+    else:
+        filenames, labels, class_indices = DatasetManifest().classes(
+            config.ilp_img_path)
+        paths = None
+
+    data = ImageSequence(filenames,
+                         labels,
+                         directory=config.ilp_img_path,
+                         class_indices=class_indices,
+                         batch_size=10,
+                         paths=paths)
 
     return data
 
 
 def n_selected_images():
-    """Return number of images"""
-    try:
-        return len(list(paths.list_images(config.ilp_img_path)))
-    except Exception as e:
-        # might fail in case dir has not been created
-        print('[!] Failed checking for existing images')
-        print(e)
-        return 0  # in that case there are no images yet
+    """Return number of images, 0 if no images have been selected yet"""
+    return (Selection().count()
+            or DatasetManifest().count(config.ilp_img_path))
 
 
 if __name__ == "__main__":
 
     args = parser.parse_args()
 
+    # the later stages read the relevance maps of config.relevance_path
+    relevance_method = os.path.basename(config.relevance_path)
+    if relevance_method not in args.methods:
+        print(f'[!] {relevance_method} is not among the methods, the '
+              f'relevance maps in {config.relevance_path} the annotations, '
+              'proposals and background knowledge are created from will '
+              'not be updated', file=sys.stderr)
+
     vgg = VGGFinetune()
 
     # check if images already exist
@@ -91,13 +125,23 @@ if __name__ == "__main__":
                            vgg,
                            info,
                            n=args.n,
-                           only_correct=args.only_correct)
+                           only_correct=args.only_correct,
+                           strategy=args.strategy,
+                           mode=args.mode)
 
     # Heatmaps
-    steps = (n_images // 10)
     data = selection_generator()
     data.reset()
-    analyzer = DeepTaylor(vgg.model, data)
-    analysis = analyzer.analyze(steps)
-    hmap_path = os.path.sep.join([config.ilp_path, 'deep_taylor_images'])
-    analyzer.save_images(hmap_path)
+    analyzers = AnalyzerSet(vgg.model, data, args.methods,
+                            config.analyzer_params)
+
+    # reuse heatmaps of unchanged images, only possible for trained weights
+    caches = None
+    if args.cache and os.path.isfile(config.vgg_path):
+        caches = analyzers.create_caches(config.vgg_path,
+                                         config.heatmap_cache_path,
+                                         config.heatmap_cache_size)
+
+    stores = analyzers.create_stores(config.relevance_root)
+    analysis = analyzers.analyze(stores=stores, caches=caches)
+    analyzers.save_images(config.ilp_path)
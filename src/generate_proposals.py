@@ -0,0 +1,70 @@
+""" Annotate the heatmaps automatically
+
+The connected regions of high relevance in the relevance maps written by
+generate_heatmaps.py are proposed as bounding boxes and stored as VOC xml
+files in the annotation directory, where generate_samples.py reads them.
+Existing annotations, e.g. manual ones, are kept. The proposals can be
+reviewed and corrected with the same tool as manual annotations.
+"""
+import os
+import sys
+import argparse
+
+from tqdm import tqdm
+
+import config
+from heatmapping import proposals
+from heatmapping.heatmap_store import HeatmapStore
+from ilp.structures.feature_type import FeatureType
+
+parser = argparse.ArgumentParser(description='Propose annotations')
+parser.add_argument('--threshold', default=config.proposal_threshold,
+                    type=float,
+                    help=('Minimum relevance of a region relative to the '
+                          'maximum relevance of its heatmap.'))
+parser.add_argument('--overwrite', action='store_true',
+                    help='Replace existing annotations of a heatmap.')
+parser.add_argument('--batch_size', default=64, type=int,
+                    help='Number of heatmaps labelled at once.')
+
+
+if __name__ == "__main__":
+
+    args = parser.parse_args()
+
+    store = HeatmapStore(config.relevance_path)
+    if not store.exists():
+        print('[!] No relevance maps, generate the heatmaps first.',
+              file=sys.stderr)
+        sys.exit(1)
+    store.warn_outdated()
+    store.open()
+
+    os.makedirs(config.annotation_path, exist_ok=True)
+    annotations = set(os.listdir(config.annotation_path))
+
+    # heatmaps without an annotation, in store order
+    indices = [i for i, name in enumerate(store.filenames)
+               if args.overwrite
+               or os.path.splitext(name)[0] + '.xml' not in annotations]
+    print(f'[*] Proposing regions for {len(indices)} heatmaps')
+
+    n_regions = 0
+    size = store.relevance.shape[1:]
+    for start in tqdm(range(0, len(indices), args.batch_size)):
+        batch = indices[start:start + args.batch_size]
+        boxes = proposals.propose(store.relevance[batch],
+                                  threshold=args.threshold,
+                                  kernel_size=config.proposal_kernel_size,
+                                  min_area=config.proposal_min_area,
+                                  max_regions=config.proposal_max_regions)
+
+        for index, map_boxes in zip(batch, boxes):
+            proposals.write_voc(config.annotation_path,
+                                store.filenames[index],
+                                map_boxes,
+                                size,
+                                name=FeatureType.region.name)
+            n_regions += len(map_boxes)
+
+    print(f'[+] Stored {n_regions} regions in {config.annotation_path}')
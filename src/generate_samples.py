@@ -10,10 +10,14 @@ parser.add_argument('--show', default=False, type=bool,
                           'Requires user to close the plot in order to proceed.'
                           'Can be used to verify that everything has been '
                           'created correctly.'))
+parser.add_argument('--resume', action='store_true',
+                    help=('Keep the samples of a previous, e.g. interrupted, '
+                          'run and only parse annotations that have not been '
+                          'stored yet.'))
 
 
 if __name__ == "__main__":
     print('[*] Generating samples.')
     args = parser.parse_args()
-    ilp.parse_annotations.parse(args.show)
+    ilp.parse_annotations.parse(args.show, args.resume)
     print('[+] Samples created. You can now generate aleph.')
@@ -0,0 +1,77 @@
+"""Compare several iNNvestigate methods on the same images
+
+The analyzers of the set share the input generator: every batch is loaded
+and preprocessed once and then analyzed by each method, which writes its
+relevance maps to its own store.
+"""
+
+import os
+
+from heatmapping.deep_taylor import DeepTaylor, analyze_batches
+from heatmapping.heatmap_store import HeatmapStore
+
+
+class AnalyzerSet():
+
+    def __init__(self, model, inputs, methods, params=None):
+        """Create one analyzer per method
+
+        Parameters
+        ----------
+        methods : list
+            Names of iNNvestigate analyzers, e.g. deep_taylor, lrp.z,
+            lrp.alpha_beta, gradient
+
+        params : dict
+            Keyword arguments for the analyzers by method name
+        """
+
+        params = params or {}
+        self.inputs = inputs
+        self.analyzers = [DeepTaylor(model, inputs, method, params.get(method))
+                          for method in methods]
+
+    @property
+    def methods(self):
+        return [analyzer.method for analyzer in self.analyzers]
+
+    def create_stores(self, path):
+        """Return a HeatmapStore per method in a subdirectory of path"""
+        return [HeatmapStore(os.path.sep.join([path, method]))
+                for method in self.methods]
+
+    def create_caches(self, weights_path, path, max_size):
+        """Return a HeatmapCache per method, entries of all methods share
+        the same directory and size limit"""
+        return [analyzer.create_cache(weights_path, path, max_size)
+                for analyzer in self.analyzers]
+
+    def analyze(self, steps=None, stores=None, caches=None):
+        """Create the heatmaps of all methods in a single pass over the
+        generator
+
+        Returns
+        -------
+        outputs : dict
+            Relevance maps by method name
+        """
+
+        outputs = analyze_batches(self.analyzers, self.inputs, steps,
+                                  stores=stores, caches=caches)
+
+        # the caches of all methods share a directory and size limit, so
+        #   it only needs to be walked once
+        evicted = set()
+        for cache in caches or []:
+            if cache is not None and cache.path not in evicted:
+                cache.evict()
+                evicted.add(cache.path)
+
+        return dict(zip(self.methods, outputs))
+
+    def save_images(self, path, **kwargs):
+        """Render the heatmaps of each method to path/<method>_images"""
+
+        for analyzer in self.analyzers:
+            method_path = os.path.sep.join([path, analyzer.method + '_images'])
+            analyzer.save_images(method_path, **kwargs)
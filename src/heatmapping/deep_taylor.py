@@ -1,54 +1,220 @@
-"""Create a deep taylor analyser with the iNNvestigate toolkit"""
+"""Create a deep taylor analyser with the iNNvestigate toolkit
+
+Other iNNvestigate methods, e.g. lrp.z or gradient, can be used the same way
+with the method argument.
+"""
 
 import os
 
 import innvestigate
 import numpy as np
-import matplotlib.pyplot as plt
 from tqdm import tqdm
 
+import config
 import helpers.img
+from heatmapping import render
+from heatmapping.heatmap_cache import HeatmapCache
+
+
+def analyze_batches(analyzers, inputs, steps=None, stores=None,
+                    caches=None):
+    """Run several analyzers on the batches of one generator
+
+    Each batch is loaded and preprocessed once and then analyzed by every
+    analyzer. The outputs of an analyzer are allocated once for all images
+    of the generator and every batch is written into its slice, so memory
+    grows linearly with the number of images.
+
+    Parameters
+    ----------
+    analyzers : list
+        DeepTaylor instances, one per iNNvestigate method
+
+    inputs : generator
+        Unshuffled generator for the images to analyze
+
+    steps : int
+        Number of batches to analyze, defaults to as many batches as
+        needed to cover every image of the generator once
+
+    stores : list
+        HeatmapStore or None per analyzer. The relevance maps are written
+        batch by batch into the memory mapped store instead of being held
+        in memory, the index of a store is written after the last batch
+
+    caches : list
+        HeatmapCache or None per analyzer. Only the images that are not
+        cached are analyzed. The caches are not evicted, as they may share
+        a directory, see AnalyzerSet.analyze
+
+    Returns
+    -------
+    outputs : list
+        Relevance maps per analyzer with shape (n_images, 224, 224)
+    """
+
+    stores = stores or [None] * len(analyzers)
+    caches = caches or [None] * len(analyzers)
+
+    n_files = inputs.samples
+    if steps is None:
+        steps = int(np.ceil(n_files / inputs.batch_size))
+
+    # the last batch of the generator might not be full, so the
+    #   output is limited to the actual number of files
+    n_outputs = min(n_files, steps * inputs.batch_size)
+    filenames = inputs.filenames[:n_outputs]
+    filepaths = inputs.filepaths[:n_outputs]
+    names = [helpers.img.path_to_name(filename) for filename in filenames]
+
+    analyses = []
+    for store in stores:
+        if store is None:
+            analyses.append(np.empty(shape=(n_outputs, 224, 224),
+                                     dtype=np.float32))
+        else:
+            analyses.append(store.create(names).relevance)
+
+    methods = ', '.join(analyzer.method for analyzer in analyzers)
+    print(f'[*] Heatmapping with {methods}')
+
+    start = 0
+    for i in tqdm(range(steps)):
+        batch = inputs.next()
+        stop = min(start + len(batch[0]), n_outputs)
+        # index 0 to get image
+        images = batch[0][:stop - start]
+
+        for analyzer, analysis, cache in zip(analyzers, analyses, caches):
+            analysis[start:stop] = analyzer.analyze_batch(
+                images, filepaths[start:stop], cache)
+
+        start = stop
+
+    for analyzer, analysis, store, cache in zip(analyzers, analyses,
+                                                stores, caches):
+        if store is not None:
+            store.finish()
+
+        if cache is not None:
+            print(f'[+] {analyzer.method}: loaded {cache.hits} cached '
+                  f'heatmaps, computed {cache.misses}')
+
+        analyzer.outputs = analysis[:start]
+
+    return [analyzer.outputs for analyzer in analyzers]
 
 
 class DeepTaylor():
 
-    def __init__(self, model, inputs):
+    def __init__(self, model, inputs, method='deep_taylor', params=None):
+        """Create an analyzer for the images of a generator
+
+        Parameters
+        ----------
+        method : str
+            Name of the iNNvestigate analyzer, deep taylor by default
+
+        params : dict
+            Keyword arguments for the iNNvestigate analyzer
+        """
+
+        self.method = method
+        self.params = params or {}
         self.analyzer = self.create_analyzer(model)
         self.outputs = None
         self.inputs = inputs
 
     def create_analyzer(self, model):
-        analyzer = innvestigate.create_analyzer("deep_taylor", model)
+        analyzer = innvestigate.create_analyzer(self.method, model,
+                                                **self.params)
         return analyzer
 
-    def analyze(self, steps):
-        """Create the heatmap with a given model"""
+    def create_cache(self, weights_path, path, max_size):
+        """Create a HeatmapCache for the analyzer and the given weights"""
+        return HeatmapCache(path, weights_path, self.method, self.params,
+                            max_size=max_size)
+
+    def analyze(self, steps=None, store=None, cache=None):
+        """Create the heatmap with a given model
 
-        analysis = np.empty(shape=(0, 224, 224))
-        print('[*] Heatmapping with deep taylor')
+        Parameters
+        ----------
+        steps : int
+            Number of batches to analyze, defaults to all images
 
-        for i in tqdm(range(steps)):
-            batch = self.inputs.next()
-            # index 0 to get image
-            tmp_analysis = self.analyzer.analyze(batch[0])
-            outputs = self.postprocess_outputs(tmp_analysis)
-            analysis = np.append(analysis, outputs, axis=0)
+        store : HeatmapStore
+            If given, the relevance maps are written batch by batch into the
+            memory mapped store instead of being held in memory
 
-        self.outputs = analysis
+        cache : HeatmapCache
+            If given, only the images that are not cached are analyzed,
+            the generator must not be shuffled
+        """
+
+        analyze_batches([self], self.inputs, steps,
+                        stores=[store], caches=[cache])
+
+        if cache is not None:
+            cache.evict()
 
         return self.outputs
 
+    def analyze_batch(self, images, filepaths, cache=None):
+        """Return the postprocessed relevance maps for a batch of images"""
+
+        if cache is not None:
+            return self.analyze_cached(images, filepaths, cache)
+
+        return self.postprocess_outputs(self.analyzer.analyze(images))
+
+    def analyze_cached(self, images, filepaths, cache):
+        """Analyze the images of a batch that are not cached yet and load
+        the others from the cache"""
+
+        keys = [cache.key(path) for path in filepaths]
+        outputs = np.empty(shape=(len(images), 224, 224), dtype=np.float32)
+
+        missing = []
+        for index, key in enumerate(keys):
+            relevance = cache.get(key)
+            if relevance is None:
+                missing.append(index)
+            else:
+                outputs[index] = relevance
+
+        if missing:
+            tmp_analysis = self.analyzer.analyze(images[missing])
+            outputs[missing] = self.postprocess_outputs(tmp_analysis)
+            for index in missing:
+                cache.put(keys[index], outputs[index])
+
+        return outputs
+
     def postprocess_outputs(self, outputs):
-        """Transform outputs"""
-        transformed = []
-        for i, a in tqdm(enumerate(outputs)):
-            a = a.sum(axis=np.argmax(np.asarray(a.shape) == 3))
-            a /= np.max(np.abs(a))
-            transformed.append(a)
+        """Transform outputs
+
+        Sum up the color channels and normalize each heatmap to [-1, 1]
+        """
+        channel_axis = np.argmax(np.asarray(outputs.shape[1:]) == 3) + 1
+        transformed = outputs.sum(axis=channel_axis).astype(np.float32)
+        transformed /= np.max(np.abs(transformed), axis=(1, 2), keepdims=True)
 
-        return np.array(transformed)
+        return transformed
 
-    def save_images(self, path, cmap='seismic', dpi=271):
+    def save_images(self, path, cmap='seismic',
+                    backend=config.render_backend, processes=None):
+        """Render the heatmaps of the last analysis as png files
+
+        Parameters
+        ----------
+        backend : str
+            matplotlib renders one figure per image like before, lut
+            with a vectorized colormap lookup, see config.render_backend
+
+        processes : int
+            Number of processes to render with, None for all cores
+        """
 
         if self.outputs is None:
             print('[!] No images to save')
@@ -59,23 +225,16 @@ class DeepTaylor():
             filenames = self.inputs.filenames
             print(f'Filenames: {len(filenames)}')
             print(f'Outputs: {len(self.outputs)}')
-            files = len(filenames)
-
-            # the analyzer uses generator batches to create the outputs
-            #   e.g. with 100 files and a step size of 32, we will need
-            #   4 steps, but this will generate 128 outputs, so we limit
-            #   the output loop to the number of input files we have
-            #   in order to avoid duplicate outputs and an IndexError
-            for index, img in enumerate(tqdm(self.outputs[:files])):
-
-                filename = helpers.img.path_to_name(filenames[index])
-                savepath = os.path.sep.join([path, filename])
-                fig = plt.figure(None,
-                                 figsize=(2.24+0.3, 2.24+0.3),
-                                 dpi=100,
-                                 tight_layout=True,
-                                 frameon=False)
-                plt.axis('off')
-                plt.imshow(img, clim=(-1, 1), cmap=cmap)
-                plt.savefig(savepath, dpi=100, bbox_inches='tight', pad_inches=0)
-                plt.close()
+
+            # outputs are limited to the number of files by analyze
+            savepaths = [os.path.sep.join([path,
+                                           helpers.img.path_to_name(filename)])
+                         for filename in filenames[:len(self.outputs)]]
+
+            saved = render.save_images(savepaths,
+                                       self.outputs,
+                                       cmap=cmap,
+                                       backend=backend,
+                                       processes=processes)
+            for _ in tqdm(saved, total=len(savepaths)):
+                pass
@@ -0,0 +1,131 @@
+"""Persistent cache for relevance maps
+
+Every relevance map is stored under a key that hashes the model weights,
+the analyzer with its parameters and the bytes of the input image. As long
+as none of these change, the relevance map is loaded from disk instead of
+being recomputed. The cache is bounded in size and evicts the least
+recently used entries first.
+"""
+
+import os
+import json
+import hashlib
+
+import numpy as np
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Return the sha1 hex digest of a file's content"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HeatmapCache():
+
+    def __init__(self, path, weights_path, method, params=None,
+                 max_size=2 * 1024**3):
+        """Open or create a cache
+
+        Parameters
+        ----------
+        path : str
+            Directory to store the cached relevance maps in
+
+        weights_path : str
+            Weights file of the analyzed model
+
+        method : str
+            Name of the iNNvestigate analyzer, e.g. deep_taylor
+
+        params : dict
+            Keyword arguments the analyzer has been created with
+
+        max_size : int
+            Maximum size of the cache in bytes
+        """
+
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        # everything but the image that determines the relevance map
+        settings = json.dumps({'weights': hash_file(weights_path),
+                               'method': method,
+                               'params': params or {}},
+                              sort_keys=True)
+        self.prefix = hashlib.sha1(settings.encode()).hexdigest()
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, image_path):
+        """Content address of the relevance map for an image"""
+        digest = hashlib.sha1(self.prefix.encode())
+        with open(image_path, 'rb') as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.sep.join([self.path, key[:2], key + '.npy'])
+
+    def get(self, key):
+        """Load a relevance map, returns None if the key is not cached"""
+        entry = self.entry_path(key)
+        try:
+            relevance = np.load(entry)
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+
+        # the modification time marks the last use for the eviction
+        os.utime(entry)
+        self.hits += 1
+        return relevance
+
+    def put(self, key, relevance):
+        entry = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+        # write to a temporary file first, so an interrupted run never
+        #   leaves a truncated entry behind
+        tmp_entry = entry + '.tmp'
+        with open(tmp_entry, 'wb') as f:
+            np.save(f, np.asarray(relevance, dtype=np.float32))
+        os.replace(tmp_entry, entry)
+
+    def entries(self):
+        """Return all entries as (last use, size, path) tuples"""
+        entries = []
+        for root, dirs, files in os.walk(self.path):
+            for filename in files:
+                if filename.endswith('.npy'):
+                    stat = os.stat(os.path.join(root, filename))
+                    entries.append((stat.st_mtime, stat.st_size,
+                                    os.path.join(root, filename)))
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits
+        into max_size
+
+        Returns
+        -------
+        n_evicted : int
+            Number of removed entries
+        """
+
+        entries = sorted(self.entries())
+        size = sum(entry[1] for entry in entries)
+
+        n_evicted = 0
+        for last_use, entry_size, entry in entries:
+            if size <= self.max_size:
+                break
+            os.remove(entry)
+            size -= entry_size
+            n_evicted += 1
+
+        return n_evicted
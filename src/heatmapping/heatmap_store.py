@@ -0,0 +1,131 @@
+"""Store the raw relevance maps of an analyzer on disk
+
+The relevance maps are kept in a single .npy file next to a json index of
+the heatmap filenames. The array is memory mapped, so the analyzer only
+holds one batch in memory and later stages read the exact float values
+through zero-copy slices instead of the rendered heatmap images. The
+index is written last, so a store only exists once all of its relevance
+maps have been written.
+"""
+
+import os
+import sys
+import json
+
+import numpy as np
+
+import config
+
+
+class HeatmapStore():
+
+    def __init__(self, path):
+        """Create a store in a given directory
+
+        Parameters
+        ----------
+        path : str
+            Directory containing the relevance array and the index
+        """
+
+        self.path = path
+        self.array_path = os.path.sep.join([path, 'relevance.npy'])
+        self.index_path = os.path.sep.join([path, 'index.json'])
+        self.relevance = None
+        self.filenames = []
+        self.index = {}
+
+    def exists(self):
+        return (os.path.isfile(self.array_path)
+                and os.path.isfile(self.index_path))
+
+    def outdated(self, paths=(config.selection_path, config.vgg_path)):
+        """Return the paths that have been modified after the store was
+        created, e.g. a new selection or retrained model weights
+
+        Parameters
+        ----------
+        paths : list
+            Files the relevance maps depend on, missing files are ignored
+        """
+
+        created = os.path.getmtime(self.index_path)
+        return [path for path in paths
+                if os.path.exists(path) and os.path.getmtime(path) > created]
+
+    def warn_outdated(self, paths=(config.selection_path, config.vgg_path)):
+        """Print a warning per outdated dependency of the store
+
+        Returns
+        -------
+        outdated : bool
+            True if the store is older than any of the paths
+        """
+
+        outdated = self.outdated(paths)
+        for path in outdated:
+            print(f'[!] {path} changed after the relevance maps in '
+                  f'{self.path} were created, run generate_heatmaps.py '
+                  'again', file=sys.stderr)
+        return bool(outdated)
+
+    def create(self, filenames, shape=(224, 224)):
+        """Allocate the relevance array on disk for the given heatmaps
+
+        Parameters
+        ----------
+        filenames : list
+            Heatmap filenames, e.g. pos_neg_pic_00046.png, in the order
+            the relevance maps will be written
+        """
+
+        os.makedirs(self.path, exist_ok=True)
+        # remove the index before overwriting the relevance maps
+        if os.path.isfile(self.index_path):
+            os.remove(self.index_path)
+
+        self.set_filenames(filenames)
+        self.relevance = np.lib.format.open_memmap(
+            self.array_path,
+            mode='w+',
+            dtype=np.float32,
+            shape=(len(self.filenames),) + tuple(shape))
+
+        return self
+
+    def open(self, mode='r'):
+        """Memory map an existing store"""
+
+        self.relevance = np.load(self.array_path, mmap_mode=mode)
+        with open(self.index_path) as f:
+            self.set_filenames(json.load(f))
+
+        return self
+
+    def set_filenames(self, filenames):
+        self.filenames = list(filenames)
+        self.index = {name: i for i, name in enumerate(self.filenames)}
+
+    def flush(self):
+        if isinstance(self.relevance, np.memmap):
+            self.relevance.flush()
+
+    def finish(self):
+        """Flush the relevance maps and write the index, call once all
+        relevance maps of a created store have been written"""
+
+        self.flush()
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.filenames, f)
+        os.replace(tmp_path, self.index_path)
+
+    def get(self, filename):
+        """Return the relevance map of a heatmap as a view into the store"""
+        return self.relevance[self.index[filename]]
+
+    def __contains__(self, filename):
+        return filename in self.index
+
+    def __len__(self):
+        return len(self.filenames)
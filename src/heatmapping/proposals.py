@@ -0,0 +1,191 @@
+"""Propose bounding boxes from relevance maps
+
+The relevance maps are thresholded relative to the maximum of each map and
+the connected regions above the threshold become bounding boxes. The masks
+are closed one by one with the default border of OpenCV, then the whole
+batch is labelled with a single OpenCV call: the closed masks are tiled
+into one mosaic image with empty gaps between them, so no region can cross
+from one map into another.
+
+The boxes are in pixels of the relevance maps and written as VOC xml files,
+the format of the manual annotations read by ilp.parse_annotations.
+"""
+
+import os
+import xml.etree.ElementTree as ET
+
+import cv2
+import numpy as np
+
+
+def threshold_maps(relevance, threshold):
+    """Masks of the pixels with at least threshold * max of their map
+
+    Parameters
+    ----------
+    relevance : numpy.ndarray
+        (n, h, w) relevance maps
+
+    Returns
+    -------
+    numpy.ndarray
+        (n, h, w) uint8 masks, 1 for relevant pixels
+    """
+
+    relevance = np.asarray(relevance, dtype=np.float32)
+    maximum = relevance.reshape(len(relevance), -1).max(axis=1)
+    # maps without positive relevance have no regions
+    limit = np.where(maximum > 0, threshold * maximum, np.inf)
+
+    return (relevance >= limit[:, np.newaxis, np.newaxis]).astype(np.uint8)
+
+
+def mosaic(masks, gap):
+    """Tile masks into a single image with gap empty pixels between them
+
+    The mask of index i starts at row (i // columns) * (h + gap) + gap and
+    column (i % columns) * (w + gap) + gap.
+
+    Returns
+    -------
+    image : numpy.ndarray
+        The mosaic
+
+    columns : int
+        Number of masks per row of the mosaic
+    """
+
+    n, height, width = masks.shape
+    columns = int(np.ceil(np.sqrt(n)))
+    rows = int(np.ceil(n / columns))
+
+    tiles = np.zeros((rows * columns, height + gap, width + gap),
+                     dtype=np.uint8)
+    tiles[:n, :height, :width] = masks
+    image = (tiles.reshape(rows, columns, height + gap, width + gap)
+             .transpose(0, 2, 1, 3)
+             .reshape(rows * (height + gap), columns * (width + gap)))
+    # no mask touches the border of the image
+    image = np.pad(image, ((gap, 0), (gap, 0)), mode='constant')
+
+    return image, columns
+
+
+def label_regions(masks, kernel_size=5, min_area=16):
+    """Bounding boxes of the connected regions of a batch of masks
+
+    Parameters
+    ----------
+    masks : numpy.ndarray
+        (n, h, w) uint8 masks, e.g. from threshold_maps
+
+    kernel_size : int
+        Size of the morphological closing joining nearby pixels into one
+        region, 0 for none
+
+    min_area : int
+        Minimum number of pixels of a region
+
+    Returns
+    -------
+    images : numpy.ndarray
+        Index of the mask of each region
+
+    boxes : numpy.ndarray
+        (xmin, ymin, xmax, ymax) of each region in pixels of its mask,
+        xmax and ymax are exclusive
+
+    areas : numpy.ndarray
+        Number of pixels of each region
+    """
+
+    n, height, width = masks.shape
+    if n == 0:
+        return (np.empty(0, dtype=np.int64), np.empty((0, 4), dtype=np.int64),
+                np.empty(0, dtype=np.int64))
+
+    # closing the mosaic would treat the gaps as background at the edges
+    #   of the maps, unlike the default border of a single map
+    if kernel_size > 1:
+        kernel = np.ones((kernel_size, kernel_size), dtype=np.uint8)
+        masks = np.stack([cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+                          for mask in masks])
+
+    # a single empty pixel separates 8-connected regions
+    gap = 1
+    image, columns = mosaic(masks, gap)
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(image, connectivity=8)
+
+    # the first component is the background
+    x, y, w, h, areas = stats[1:].T.astype(np.int64)
+    keep = areas >= min_area
+    x, y, w, h, areas = x[keep], y[keep], w[keep], h[keep], areas[keep]
+
+    # regions lie inside of their tile
+    column = (x - gap) // (width + gap)
+    row = (y - gap) // (height + gap)
+    images = row * columns + column
+
+    xmin = x - gap - column * (width + gap)
+    ymin = y - gap - row * (height + gap)
+    boxes = np.column_stack([xmin, ymin, xmin + w, ymin + h])
+
+    return images, boxes, areas
+
+
+def propose(relevance, threshold=0.3, kernel_size=5, min_area=16,
+            max_regions=10):
+    """Bounding boxes of the relevant regions of each map
+
+    Returns
+    -------
+    list
+        (k, 4) array of boxes per map, the largest regions first
+    """
+
+    masks = threshold_maps(relevance, threshold)
+    images, boxes, areas = label_regions(masks, kernel_size, min_area)
+
+    # by map, then largest area first
+    order = np.lexsort((-areas, images))
+    images, boxes = images[order], boxes[order]
+
+    splits = np.searchsorted(images, np.arange(1, len(masks)))
+    return [map_boxes[:max_regions] for map_boxes in np.split(boxes, splits)]
+
+
+def write_voc(path, filename, boxes, size, name='region'):
+    """Write bounding boxes as VOC xml, named like the heatmap
+
+    Parameters
+    ----------
+    filename : str
+        The annotated heatmap, e.g. pos_neg_pic_00046.png, written to
+        pos_neg_pic_00046.xml
+
+    size : tuple
+        (height, width) of the heatmap
+    """
+
+    annotation = ET.Element('annotation')
+    ET.SubElement(annotation, 'filename').text = filename
+
+    size_element = ET.SubElement(annotation, 'size')
+    ET.SubElement(size_element, 'width').text = str(size[1])
+    ET.SubElement(size_element, 'height').text = str(size[0])
+    ET.SubElement(size_element, 'depth').text = '3'
+
+    for xmin, ymin, xmax, ymax in boxes:
+        obj = ET.SubElement(annotation, 'object')
+        ET.SubElement(obj, 'name').text = name
+        ET.SubElement(obj, 'pose').text = 'Unspecified'
+        ET.SubElement(obj, 'truncated').text = '0'
+        ET.SubElement(obj, 'difficult').text = '0'
+        bndbox = ET.SubElement(obj, 'bndbox')
+        for tag, value in zip(['xmin', 'ymin', 'xmax', 'ymax'],
+                              [xmin, ymin, xmax, ymax]):
+            ET.SubElement(bndbox, tag).text = str(int(value))
+
+    xml_name = os.path.splitext(filename)[0] + '.xml'
+    ET.ElementTree(annotation).write(os.path.sep.join([path, xml_name]))
@@ -0,0 +1,122 @@
+"""Render relevance maps as heatmap images
+
+The relevance values are mapped to RGBA with a precomputed lookup table of
+the colormap and written straight to PNG, which avoids creating a
+matplotlib figure per image. The encoding can be spread over a process
+pool.
+
+The lookup table writes the map at its own resolution, while the figures
+are padded and rescaled depending on the matplotlib version. Annotations
+drawn on figure renderings only match those, so figures stay the default
+(see config.render_backend).
+"""
+
+from functools import lru_cache
+from multiprocessing import Pool
+
+import numpy as np
+import matplotlib.image
+import matplotlib.pyplot as plt
+
+
+@lru_cache()
+def lookup_table(cmap='seismic', n_colors=256):
+    """Return the RGBA colors of a matplotlib colormap as uint8 array"""
+    colors = plt.get_cmap(cmap, n_colors)(np.arange(n_colors))
+    return (colors * 255).astype(np.uint8)
+
+
+def to_rgba(relevance, cmap='seismic', clim=(-1, 1)):
+    """Map relevance values to RGBA pixels
+
+    Quantizes the values the same way matplotlib does for imshow with the
+    given color limits, values outside of the limits are clipped.
+
+    Parameters
+    ----------
+    relevance : numpy.ndarray
+        Relevance map(s) of arbitrary shape
+
+    Returns
+    -------
+    rgba : numpy.ndarray
+        uint8 array with an additional axis of length 4
+    """
+
+    lut = lookup_table(cmap)
+    n_colors = len(lut)
+    vmin, vmax = clim
+
+    scaled = (np.asarray(relevance, dtype=np.float32) - vmin) / (vmax - vmin)
+    invalid = np.isnan(scaled)
+    scaled[invalid] = 0
+    indices = np.clip(scaled * n_colors, 0, n_colors - 1).astype(np.intp)
+
+    rgba = lut[indices]
+    # nan values are transparent like matplotlibs default bad color
+    rgba[invalid] = 0
+
+    return rgba
+
+
+def save_png(job):
+    """Write a single relevance map, job is a tuple (path, relevance, cmap)"""
+    path, relevance, cmap = job
+    matplotlib.image.imsave(path, to_rgba(relevance, cmap))
+    return path
+
+
+def save_figure(job):
+    """Write a single relevance map with a matplotlib figure
+
+    This is the original rendering of the heatmaps, which pads and rescales
+    the image the way matplotlib lays out the figure.
+    """
+    path, relevance, cmap = job
+    plt.figure(None,
+               figsize=(2.24+0.3, 2.24+0.3),
+               dpi=100,
+               tight_layout=True,
+               frameon=False)
+    plt.axis('off')
+    plt.imshow(relevance, clim=(-1, 1), cmap=cmap)
+    plt.savefig(path, dpi=100, bbox_inches='tight', pad_inches=0)
+    plt.close()
+    return path
+
+
+def save_images(paths, relevance, cmap='seismic', backend='matplotlib',
+                processes=None, chunksize=16):
+    """Render relevance maps to the given paths
+
+    Parameters
+    ----------
+    paths : list
+        Output path for each relevance map
+
+    relevance : numpy.ndarray
+        Relevance maps with shape (n, height, width)
+
+    backend : str
+        matplotlib: one figure per image with the geometry of the
+        existing heatmaps, lut: vectorized lookup table
+
+    processes : int
+        Number of worker processes, 1 renders in the current process and
+        None uses all cores
+
+    Returns
+    -------
+    generator
+        Yields the written paths as soon as they are done
+    """
+
+    render = {'lut': save_png, 'matplotlib': save_figure}[backend]
+    jobs = ((path, relevance[i], cmap) for i, path in enumerate(paths))
+
+    if processes == 1:
+        for job in jobs:
+            yield render(job)
+    else:
+        with Pool(processes) as pool:
+            yield from pool.imap_unordered(render, jobs, chunksize=chunksize)
@@ -0,0 +1,60 @@
+"""Predict every image of a generator exactly once"""
+
+import time
+
+import numpy as np
+
+import config
+
+
+def n_steps(n, batch_size):
+    """Number of batches needed to cover n images"""
+    return int(np.ceil(n / batch_size))
+
+
+def predict(model, generator, n=None, workers=config.workers,
+            max_queue_size=config.max_queue_size):
+    """Predict the images of an unshuffled generator
+
+    Runs ceil(n / batch_size) steps, so no batch wraps around to the start
+    of the generator.
+
+    Parameters
+    ----------
+    model : keras.Model
+        Model to predict with
+
+    generator : generator
+        Keras directory iterator or ImageSequence, must not be shuffled
+
+    n : int
+        Number of images to predict, defaults to all images of the generator
+
+    workers : int
+        Number of threads loading batches while the model predicts
+
+    Returns
+    -------
+    predictions : numpy.ndarray
+        Model outputs aligned to generator.filenames
+    """
+
+    if n is None:
+        n = generator.samples
+
+    generator.reset()
+    steps = n_steps(n, generator.batch_size)
+
+    start = time.time()
+    predictions = model.predict_generator(generator,
+                                          steps=steps,
+                                          workers=workers,
+                                          max_queue_size=max_queue_size)
+    duration = max(time.time() - start, 1e-9)
+    generator.reset()
+
+    predictions = predictions[:n]
+    print(f'[+] Predicted {len(predictions)} images in {duration:.1f}s '
+          f'({len(predictions) / duration:.1f} images/s)')
+
+    return predictions
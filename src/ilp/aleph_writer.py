@@ -0,0 +1,417 @@
+"""Write the Aleph files from a stream of samples
+
+The samples are read lazily in chunks, e.g. from the SampleStore or a
+memory mapped SampleCollection. For each chunk the relations of all
+feature pairs are computed at once and the facts are formatted as arrays
+of strings, which are written to the buffered files in one call per chunk.
+Memory only depends on the chunk size, not on the number of samples.
+"""
+
+import os
+import json
+import hashlib
+from itertools import islice
+
+import numpy as np
+from tqdm import tqdm
+
+import config
+from ilp import relations as relations_engine
+from ilp.structures import predicates
+from ilp.structures.feature_type import FeatureType
+from ilp.relevance_stats import relevance_stats
+from ilp.structures.sample_collection import SampleCollection
+
+# version of the formatting of the facts, e.g. the names of the parts.
+#   Increase it on changes, so incremental runs do not reuse old segments
+FORMAT_VERSION = 1
+
+# name of each feature type, indexed by its value
+KIND_NAMES = np.array([str(kind) for kind in sorted(FeatureType,
+                                                    key=lambda k: k.value)])
+
+
+def concat(*parts):
+    """Element-wise concatenation of string arrays and constants"""
+    result = parts[0]
+    for part in parts[1:]:
+        result = np.char.add(result, part)
+    return result
+
+
+def occurrences(groups):
+    """Number of earlier elements of the same group for every element"""
+
+    groups = np.asarray(groups)
+    order = np.argsort(groups, kind='stable')
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.concatenate(
+        [[True], sorted_groups[1:] != sorted_groups[:-1]]))
+    counts = np.diff(np.append(starts, len(groups)))
+
+    result = np.empty(len(groups), dtype=np.int64)
+    result[order] = np.arange(len(groups)) - np.repeat(starts, counts)
+    return result
+
+
+class AlephWriter():
+
+    def __init__(self, path, preds, settings=config.aleph_settings,
+                 symmetric_facts=config.symmetric_facts,
+                 number_parts=config.number_parts, heatmaps=None,
+                 chunk_size=1000, buffer_size=1 << 20):
+        """
+        Parameters
+        ----------
+        path : str
+            Directory for the files picasso.b, picasso.f and picasso.n
+
+        preds : list
+            Predicate classes to write modes and determinations for, the
+            binary predicates are computed for every pair of features
+            with their kernel, see predicates.load
+
+        symmetric_facts : str
+            'both', 'once' or 'rule', how the facts of symmetric
+            predicates are written, see config.symmetric_facts
+
+        number_parts : bool
+            Number further parts of the same kind in a sample, see
+            config.number_parts
+
+        heatmaps : HeatmapStore
+            Opened store with the relevance maps, needed by the unary
+            predicates of the parts, e.g. relevant
+
+        chunk_size : int
+            Number of samples formatted at once
+
+        buffer_size : int
+            Size of the write buffer of each file in bytes
+        """
+
+        if symmetric_facts not in ('both', 'once', 'rule'):
+            raise ValueError(f'Unknown symmetric_facts {symmetric_facts}, '
+                             "use 'both', 'once' or 'rule'")
+
+        self.path = path
+        self.preds = preds
+        self.settings = settings
+        self.symmetric_facts = symmetric_facts
+        self.number_parts = number_parts
+        self.heatmaps = heatmaps
+        self.chunk_size = chunk_size
+        self.buffer_size = buffer_size
+        self.unary = [pred for pred in preds if pred.type == 'unary']
+        self.binary = [pred for pred in preds if pred.type == 'binary']
+        self.kernels = predicates.kernels(preds)
+        self.symmetric = {pred.name for pred in self.binary if pred.symmetric}
+
+    def header(self):
+        """Settings, modes and determinations of the background knowledge"""
+
+        lines = [self.settings[0]]
+        lines += [pred.mode() for pred in self.preds]
+        lines += [pred.determination() for pred in self.preds]
+        lines += self.settings[1:]
+
+        if self.symmetric_facts == 'rule':
+            for pred in self.binary:
+                if pred.symmetric:
+                    lines += predicates.declarations(pred)
+                    lines += predicates.closure(pred)
+        elif self.symmetric_facts == 'once':
+            lines.append(predicates.once_comment(
+                [pred for pred in self.binary if pred.symmetric]))
+
+        return [line for line in lines if line]
+
+    def relevance_stats(self, samples):
+        """Relevance statistics of the features for the unary predicates"""
+
+        if self.heatmaps is None:
+            raise ValueError(f'{[pred.name for pred in self.unary]} need the '
+                             'relevance maps, generate the heatmaps first.')
+
+        return relevance_stats(samples, self.heatmaps)
+
+    def format(self, samples, stats=None):
+        """Format the facts of a SampleCollection
+
+        Parameters
+        ----------
+        stats : dict
+            Relevance statistics of the features for the unary
+            predicates, computed if not given, see relevance_stats
+
+        Returns
+        -------
+        background, positive, negative : list
+            Lines for the three files. The background knowledge is ordered
+            by sample, in each sample has_a, is_a and the unary predicates
+            per feature come first, followed by the binary predicates.
+
+        background_offsets : numpy.ndarray
+            Background lines of sample i are
+            background_offsets[i]:background_offsets[i+1]
+        """
+
+        identifiers = np.array(samples.identifiers, dtype=str)
+
+        # examples: face(identifier). by predicted class
+        examples = concat(predicates.Face.name + '(', identifiers, ').')
+        positive = examples[samples.predicted_class == 1].tolist()
+        negative = examples[samples.predicted_class == 0].tolist()
+
+        # part atoms, e.g. pos_01nose
+        sample_index = samples.sample_index
+        feature_ids = identifiers[sample_index]
+        kinds = KIND_NAMES[samples.kinds]
+        parts = concat(feature_ids, kinds)
+        if self.number_parts:
+            # e.g. pos_01region1 for the second region
+            repeat = occurrences(sample_index * len(KIND_NAMES)
+                                 + samples.kinds)
+            parts = concat(parts,
+                           np.where(repeat > 0, repeat.astype(str), ''))
+
+        # the position in the lines of a sample defines the order
+        position = np.arange(len(parts)) - samples.offsets[sample_index]
+        lines = [concat(predicates.HasA.name + '(', feature_ids, ', ', parts,
+                        ').'),
+                 concat(predicates.IsA.name + '(', parts, ', ', kinds, ').')]
+        owners = [sample_index, sample_index]
+        per_feature = 2 + len(self.unary)
+        keys = [per_feature * position, per_feature * position + 1]
+
+        if self.unary and stats is None:
+            stats = self.relevance_stats(samples)
+        for order, pred in enumerate(self.unary):
+            holds = pred.kernel(stats)
+            lines.append(concat(pred.name + '(', parts[holds], ').'))
+            owners.append(sample_index[holds])
+            keys.append(per_feature * position[holds] + 2 + order)
+
+        a, b, pair_offsets, relations = relations_engine.pair_relations(
+            samples.bboxes, samples.offsets, self.kernels, self.symmetric)
+        pair_sample = np.repeat(np.arange(len(samples)),
+                                np.diff(pair_offsets))
+        pair_position = np.arange(len(a)) - pair_offsets[pair_sample]
+        n_features = np.diff(samples.offsets)
+        n_pairs = np.diff(pair_offsets)
+
+        for order, pred in enumerate(self.binary):
+            holds = relations[pred.name]
+            if pred.symmetric and self.symmetric_facts != 'both':
+                # a single fact per unordered pair
+                holds = holds & (a < b)
+            name = predicates.fact_name(pred, self.symmetric_facts)
+            lines.append(concat(name + '(', parts[a[holds]], ', ',
+                                parts[b[holds]], ').'))
+            owners.append(pair_sample[holds])
+            # after the features, then by predicate and pair
+            keys.append(per_feature * n_features[pair_sample[holds]]
+                        + order * n_pairs[pair_sample[holds]]
+                        + pair_position[holds])
+
+        lines = np.concatenate(lines)
+        owners = np.concatenate(owners)
+        order = np.lexsort((np.concatenate(keys), owners))
+
+        counts = np.bincount(owners, minlength=len(samples))
+        background_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        return lines[order].tolist(), positive, negative, background_offsets
+
+    def chunks(self, samples):
+        """SampleCollections of chunk_size samples
+
+        Parameters
+        ----------
+        samples : SampleCollection or iterable
+            The collection is split without creating objects, other
+            iterables of Sample objects, e.g. a SampleStore, are read
+            chunk by chunk
+        """
+
+        if isinstance(samples, SampleCollection):
+            for start in range(0, len(samples), self.chunk_size):
+                yield samples.take(np.arange(
+                    start, min(start + self.chunk_size, len(samples))))
+            return
+
+        samples = iter(samples)
+        while True:
+            chunk = list(islice(samples, self.chunk_size))
+            if not chunk:
+                return
+            yield SampleCollection.from_samples(chunk)
+
+    def write(self, samples, total=None):
+        """Write the Aleph files for the samples
+
+        Parameters
+        ----------
+        samples : SampleCollection or iterable
+            All samples, read chunk by chunk, see chunks
+
+        total : int
+            Number of samples for the progress bar
+        """
+
+        os.makedirs(self.path, exist_ok=True)
+        bg_path = os.path.sep.join([self.path, 'picasso.b'])
+        pos_path = os.path.sep.join([self.path, 'picasso.f'])
+        neg_path = os.path.sep.join([self.path, 'picasso.n'])
+
+        with open(bg_path, 'w', buffering=self.buffer_size) as bg_knowledge,\
+             open(pos_path, 'w', buffering=self.buffer_size) as pos_examples,\
+             open(neg_path, 'w', buffering=self.buffer_size) as neg_examples:
+
+            write_lines(bg_knowledge, self.header())
+
+            progress = tqdm(total=total)
+            for chunk in self.chunks(samples):
+                background, positive, negative, _ = self.format(chunk)
+                write_lines(bg_knowledge, background)
+                write_lines(pos_examples, positive)
+                write_lines(neg_examples, negative)
+                progress.update(len(chunk))
+
+            progress.close()
+
+    def settings_hash(self):
+        """Hash of everything besides the samples that changes the facts"""
+        settings = self.header() + [f'version {FORMAT_VERSION}',
+                                    self.symmetric_facts,
+                                    f'number_parts {self.number_parts}']
+        settings += [f'{pred.name} {getattr(pred, "tolerance", None)} '
+                     f'{getattr(pred, "threshold", None)}'
+                     for pred in self.preds]
+        return hashlib.sha1('\n'.join(settings).encode()).hexdigest()
+
+    def sample_hashes(self, samples, stats=None):
+        """Content hash of the features and the prediction of each sample
+        in a SampleCollection, including the relevance statistics of the
+        features if a unary predicate uses them"""
+
+        if self.unary:
+            if stats is None:
+                stats = self.relevance_stats(samples)
+            stats = np.stack([stats[name] for name in sorted(stats)], axis=1)
+
+        hashes = []
+        for index in range(len(samples)):
+            start, stop = samples.offsets[index], samples.offsets[index + 1]
+            digest = hashlib.sha1(samples.bboxes[start:stop].tobytes())
+            digest.update(samples.kinds[start:stop].tobytes())
+            if self.unary:
+                digest.update(stats[start:stop].tobytes())
+            digest.update(samples.prediction[index].tobytes())
+            digest.update(samples.predicted_class[index].tobytes())
+            hashes.append(digest.hexdigest())
+
+        return hashes
+
+    def segment_path(self, identifier):
+        """File with the background facts of a sample for write_incremental"""
+        return os.path.sep.join([self.path, 'segments', identifier + '.b'])
+
+    def write_incremental(self, samples, total=None):
+        """Write the Aleph files, only formatting new or changed samples
+
+        The background facts of each sample are kept as a segment file in
+        path/segments and a manifest maps each sample identifier to the
+        content hash of its features and prediction. Only samples with a
+        new hash are formatted, then all segments are concatenated. The
+        result is the same as with write.
+        """
+
+        segments_path = os.path.sep.join([self.path, 'segments'])
+        manifest_path = os.path.sep.join([self.path, 'manifest.json'])
+        os.makedirs(segments_path, exist_ok=True)
+
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = {}
+
+        settings = self.settings_hash()
+        stored = manifest.get('samples', {}) \
+            if manifest.get('settings') == settings else {}
+
+        hashes = {}
+        identifiers = []
+        positive = []
+        negative = []
+        n_changed = 0
+
+        progress = tqdm(total=total)
+        for collection in self.chunks(samples):
+            chunk_ids = collection.identifiers
+            # the statistics are computed once for the hashes and the facts
+            stats = self.relevance_stats(collection) if self.unary else None
+            chunk_hashes = self.sample_hashes(collection, stats)
+
+            # segments are also rewritten if they have been removed
+            changed = [index for index, (identifier, digest)
+                       in enumerate(zip(chunk_ids, chunk_hashes))
+                       if stored.get(identifier) != digest
+                       or not os.path.isfile(self.segment_path(identifier))]
+
+            if changed:
+                if stats is not None:
+                    features = np.isin(collection.sample_index, changed)
+                    stats = {name: values[features]
+                             for name, values in stats.items()}
+                background, _, _, offsets = self.format(
+                    collection.take(changed), stats)
+                for i, index in enumerate(changed):
+                    segment = self.segment_path(chunk_ids[index])
+                    with open(segment, 'w') as f:
+                        write_lines(f, background[offsets[i]:offsets[i + 1]])
+
+            for index, identifier in enumerate(chunk_ids):
+                hashes[identifier] = chunk_hashes[index]
+                identifiers.append(identifier)
+                example = f'{predicates.Face.name}({identifier}).'
+                if collection.predicted_class[index] == 1:
+                    positive.append(example)
+                else:
+                    negative.append(example)
+
+            n_changed += len(changed)
+            progress.update(len(collection))
+
+        progress.close()
+        print(f'[+] Formatted {n_changed} new or changed samples, '
+              f'reused {len(identifiers) - n_changed}')
+
+        # segments of samples that do not exist anymore
+        for identifier in set(stored) - set(hashes):
+            segment = self.segment_path(identifier)
+            if os.path.isfile(segment):
+                os.remove(segment)
+
+        bg_path = os.path.sep.join([self.path, 'picasso.b'])
+        with open(bg_path, 'w', buffering=self.buffer_size) as bg_knowledge:
+            write_lines(bg_knowledge, self.header())
+            for identifier in identifiers:
+                with open(self.segment_path(identifier)) as f:
+                    bg_knowledge.write(f.read())
+
+        for filename, lines in [('picasso.f', positive),
+                                ('picasso.n', negative)]:
+            with open(os.path.sep.join([self.path, filename]), 'w') as f:
+                write_lines(f, lines)
+
+        # the manifest is written last, so an interrupted run is redone
+        with open(manifest_path, 'w') as f:
+            json.dump({'settings': settings, 'samples': hashes}, f)
+
+
+def write_lines(file, lines):
+    """Write lines with a single call"""
+    if lines:
+        file.write('\n'.join(lines) + '\n')
@@ -0,0 +1,468 @@
+"""Score the coverage of Horn clauses on the generated Aleph files
+
+A clause like
+
+    face(A) :- has_a(A,C), is_a(C,nose), top_of(C,D)
+
+covers an example if its body can be satisfied with the head bound to the
+example. Instead of Prolog backtracking, the body is evaluated for all
+examples at once: the bindings of the variables are a table that is joined
+with one relation after the other. Constants are mapped to integers, so
+the tables are numpy arrays and every join looks up the bound arguments
+in a sorted index of the relation. Variables which are not needed by later
+literals are projected away after each join, so the table stays small and
+literals that only test for existence become semi-joins.
+"""
+
+import os
+import re
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from ilp.structures import predicates
+
+FACT = re.compile(r'^(\w+)\((.*)\)\.$')
+CLAUSE_END = re.compile(r'\.(?=\s|$)')
+RELATION = re.compile(r'^[a-z]\w*$')
+# builtins that look like relations, but are not facts of the background
+BUILTINS = {'is', 'not', 'call', 'findall', 'bagof', 'setof', 'forall',
+            'member', 'true', 'fail', 'false'}
+
+
+def is_variable(term):
+    """Prolog variables start with an upper case letter or _"""
+    return term[0].isupper() or term[0] == '_'
+
+
+def split_arguments(text):
+    """Split at the commas outside of parentheses"""
+
+    parts = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+
+    return [part for part in parts if part]
+
+
+def parse_literal(text):
+    """Parse a literal, e.g. is_a(C,nose), into (name, arguments)"""
+
+    text = text.strip()
+    if '(' not in text:
+        return text, ()
+
+    name, arguments = text.split('(', 1)
+    if not arguments.endswith(')'):
+        raise ValueError(f'Invalid literal {text}')
+
+    return name.strip(), tuple(split_arguments(arguments[:-1]))
+
+
+def parse_clause(text):
+    """Parse a Horn clause
+
+    Returns
+    -------
+    head : tuple
+        (name, arguments) of the head literal
+
+    body : list
+        (name, arguments) of each body literal, empty for a fact
+    """
+
+    text = ' '.join(text.split()).rstrip('.')
+    if ':-' in text:
+        head, body = text.split(':-', 1)
+        body = [parse_literal(literal) for literal in split_arguments(body)]
+    else:
+        head, body = text, []
+
+    return parse_literal(head), body
+
+
+def parse_clauses(text):
+    """Parse all clauses of a text, e.g. a theory printed by Aleph"""
+    return [parse_clause(clause) for clause in CLAUSE_END.split(text)
+            if clause.strip() and not clause.strip().startswith('%')]
+
+
+def check_relation(name):
+    """Raise for body literals that are not relations of the background
+    knowledge, e.g. negation or builtins like \\+, \\=, is or <"""
+
+    if not RELATION.match(name) or name in BUILTINS:
+        raise ValueError(f'Unsupported literal {name}, only relations of '
+                         'the background knowledge can be evaluated')
+
+
+def format_clause(clause):
+    head, body = clause
+    literals = [f'{name}({",".join(arguments)})' for name, arguments
+                in [head] + body]
+    if not body:
+        return literals[0] + '.'
+    return f'{literals[0]} :- {", ".join(literals[1:])}.'
+
+
+def parse_fact(line):
+    match = FACT.match(line)
+    if not match:
+        raise ValueError(f'Invalid fact {line}')
+    name, arguments = match.groups()
+    return name, tuple(split_arguments(arguments))
+
+
+def read_examples(path):
+    """Argument tuples of the examples in a .f or .n file"""
+    with open(path) as f:
+        return {parse_fact(line.strip())[1] for line in f if line.strip()}
+
+
+def argument_permutation(arguments, body):
+    """Positions of the head arguments in the body of a rule like
+    p(A, B) :- q(B, A), None for any other rule"""
+
+    if len(body) != 1 or len(body[0][1]) != len(arguments):
+        return None
+
+    body_arguments = body[0][1]
+    if not all(is_variable(term) for term in arguments) \
+            or sorted(arguments) != sorted(body_arguments) \
+            or len(set(arguments)) != len(arguments):
+        return None
+
+    return [body_arguments.index(term) for term in arguments]
+
+
+class BackgroundKnowledge():
+
+    def __init__(self, relations, positive, negative):
+        """
+        Parameters
+        ----------
+        relations : dict
+            Argument tuples by (name, arity)
+
+        positive, negative : collection
+            Argument tuples of the positive and the negative examples
+        """
+
+        terms = {term for facts in relations.values()
+                 for fact in facts for term in fact}
+        terms.update(term for examples in (positive, negative)
+                     for example in examples for term in example)
+        self.names = sorted(terms)
+        self.symbols = {name: i for i, name in enumerate(self.names)}
+
+        self.relations = {(name, arity): self.encode(facts, arity)
+                          for (name, arity), facts in relations.items()}
+        self.positive = self.encode(positive)
+        self.negative = self.encode(negative)
+        self.indices = {}
+
+    def encode(self, tuples, arity=None):
+        """Unique rows of symbol ids for argument tuples"""
+
+        tuples = list(tuples)
+        if arity is None:
+            arity = len(tuples[0]) if tuples else 0
+        rows = np.array([[self.symbols[term] for term in t] for t in tuples],
+                        dtype=np.int64).reshape(len(tuples), arity)
+
+        return self.unique_rows(rows) if len(rows) else rows
+
+    def symbol(self, term):
+        """Id of a constant, -1 if it does not occur in any fact"""
+        return self.symbols.get(term, -1)
+
+    def key(self, columns):
+        """Combine the columns of a table into a single int64 key
+
+        Keys that could overflow an int64 are records of the columns
+        instead, which sort the same way.
+        """
+
+        if len(self.names) ** columns.shape[1] >= 2 ** 62:
+            columns = np.ascontiguousarray(columns, dtype=np.int64)
+            return columns.view([(f'f{i}', np.int64)
+                                 for i in range(columns.shape[1])]).ravel()
+
+        key = np.zeros(len(columns), dtype=np.int64)
+        for column in columns.T:
+            key = key * len(self.names) + column
+        return key
+
+    def unique_rows(self, rows):
+        """Unique rows of a table of symbol ids, sorted"""
+
+        if rows.shape[1] == 0:
+            return rows[:1]
+        if len(self.names) ** rows.shape[1] >= 2 ** 62:
+            return np.unique(rows, axis=0)
+
+        # sorting a single key is much faster than sorting rows
+        key = np.unique(self.key(rows))
+        columns = []
+        for _ in range(rows.shape[1]):
+            key, column = np.divmod(key, len(self.names))
+            columns.append(column)
+
+        return np.column_stack(columns[::-1]).reshape(-1, rows.shape[1])
+
+    @classmethod
+    def load(cls, path, filestem='picasso', symmetric=None):
+        """Read the facts and examples written by generate_aleph.py
+
+        Rules of the background knowledge that only reorder the arguments
+        of another relation, e.g. the rules of symmetric_facts 'rule', are
+        applied to the facts.
+
+        Parameters
+        ----------
+        symmetric : collection
+            Names of relations whose facts are stored once per unordered
+            pair. None takes the relations listed in the header of files
+            written with symmetric_facts 'once'.
+        """
+
+        relations = defaultdict(set)
+        rules = []
+        once = []
+        with open(os.path.sep.join([path, filestem + '.b'])) as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith(predicates.ONCE_COMMENT):
+                    names = line[len(predicates.ONCE_COMMENT):].split(',')
+                    once += [name.strip() for name in names if name.strip()]
+                    continue
+                if not line or line.startswith('%') or line.startswith(':-'):
+                    continue
+                if ':-' in line:
+                    rules.append(parse_clause(line))
+                    continue
+                name, arguments = parse_fact(line)
+                relations[(name, len(arguments))].add(arguments)
+
+        for (name, arguments), body in rules:
+            permutation = argument_permutation(arguments, body)
+            if permutation is None:
+                print('[!] Ignoring rule '
+                      + format_clause(((name, arguments), body)))
+                continue
+            source = relations.get((body[0][0], len(arguments)), ())
+            relations[(name, len(arguments))].update(
+                tuple(fact[i] for i in permutation) for fact in source)
+
+        if symmetric is None:
+            symmetric = once
+        for name in symmetric:
+            facts = relations.get((name, 2), set())
+            facts.update([(b, a) for a, b in facts])
+
+        positive = read_examples(os.path.sep.join([path, filestem + '.f']))
+        negative = read_examples(os.path.sep.join([path, filestem + '.n']))
+
+        return cls(dict(relations), positive, negative)
+
+    def index(self, name, arity, positions, values=(), repeats=()):
+        """Sorted index of a relation on the argument positions
+
+        Parameters
+        ----------
+        positions : tuple
+            Argument positions of the key
+
+        values : tuple
+            Argument positions whose values are kept for each key. Facts
+            with the same key and values are only kept once.
+
+        repeats : tuple
+            Pairs of positions that need to have the same value
+
+        Returns
+        -------
+        keys : numpy.ndarray
+            Sorted keys, see key
+
+        values : numpy.ndarray
+            Values of the fact of each key
+        """
+
+        index_key = (name, arity, positions, values, repeats)
+        if index_key not in self.indices:
+            facts = self.relations.get((name, arity),
+                                       np.empty((0, arity), dtype=np.int64))
+            for a, b in repeats:
+                facts = facts[facts[:, a] == facts[:, b]]
+
+            # unique rows are sorted by the key positions first
+            table = facts[:, list(positions) + list(values)]
+            table = self.unique_rows(table) if len(table) else table
+            self.indices[index_key] = (self.key(table[:, :len(positions)]),
+                                       table[:, len(positions):])
+
+        return self.indices[index_key]
+
+    def covered_ids(self, clause, examples):
+        """Symbol ids of the head variables for the covered examples
+
+        Parameters
+        ----------
+        clause : tuple
+            Parsed clause, see parse_clause
+
+        examples : numpy.ndarray
+            Symbol ids of the examples, one row per example
+
+        Returns
+        -------
+        variables : list
+            Head variables
+
+        rows : numpy.ndarray
+            Unique values of the variables for the covered examples
+        """
+
+        (_, head), body = clause
+        for name, _ in body:
+            check_relation(name)
+
+        variables = []
+        for term in head:
+            if is_variable(term) and term not in variables:
+                variables.append(term)
+        head_variables = list(variables)
+
+        # bind the head variables to the examples
+        rows = examples
+        for position, term in enumerate(head):
+            if not is_variable(term):
+                rows = rows[rows[:, position] == self.symbol(term)]
+            elif head.index(term) != position:
+                rows = rows[rows[:, position] == rows[:, head.index(term)]]
+        rows = rows[:, [head.index(v) for v in variables]]
+
+        for i, (name, arguments) in enumerate(body):
+            if not len(rows):
+                break
+
+            columns = {v: c for c, v in enumerate(variables)}
+            bound = tuple(p for p, term in enumerate(arguments)
+                          if not is_variable(term) or term in columns)
+            bound_values = np.column_stack(
+                [rows[:, columns[arguments[p]]] if is_variable(arguments[p])
+                 else np.full(len(rows), self.symbol(arguments[p]))
+                 for p in bound] or [np.empty((len(rows), 0), np.int64)])
+
+            # first position of each new variable, repeats must be equal
+            new = {}
+            repeats = []
+            for p, term in enumerate(arguments):
+                if p in bound or term == '_':
+                    continue
+                if term in new:
+                    repeats.append((new[term], p))
+                else:
+                    new[term] = p
+
+            # only keep the variables needed by the head or later literals
+            needed = set(head_variables)
+            for _, later in body[i + 1:]:
+                needed.update(later)
+            keep = [columns[v] for v in variables if v in needed]
+            keep_new = [p for term, p in new.items() if term in needed]
+
+            keys, values = self.index(name, len(arguments), bound,
+                                      tuple(keep_new), tuple(repeats))
+            row_keys = self.key(bound_values)
+
+            start = np.searchsorted(keys, row_keys, side='left')
+            counts = np.searchsorted(keys, row_keys, side='right') - start
+            # constants that do not occur in any fact never match
+            counts[(bound_values < 0).any(axis=1)] = 0
+
+            # repeat each row for all values of its key
+            matches = np.repeat(np.arange(len(rows)), counts)
+            offsets = np.cumsum(counts) - counts
+            value_index = (np.repeat(start - offsets, counts)
+                           + np.arange(len(matches)))
+            rows = self.unique_rows(np.column_stack(
+                [rows[matches][:, keep], values[value_index]]))
+
+            variables = ([v for v in variables if v in needed]
+                         + [term for term, p in new.items() if term in needed])
+
+        columns = [variables.index(v) for v in head_variables]
+        return head_variables, self.unique_rows(rows[:, columns])
+
+    def covered(self, clause, examples):
+        """Examples for which the body of the clause can be satisfied
+
+        Parameters
+        ----------
+        clause : tuple or str
+            Parsed clause (see parse_clause) or its text
+
+        examples : collection
+            Argument tuples of the examples
+
+        Returns
+        -------
+        set
+            The covered examples
+        """
+
+        if isinstance(clause, str):
+            clause = parse_clause(clause)
+        (_, head), _ = clause
+
+        examples = [example for example in examples
+                    if len(example) == len(head)
+                    and all(term in self.symbols for term in example)]
+        variables, rows = self.covered_ids(clause,
+                                           self.encode(examples, len(head)))
+
+        covered = set()
+        for row in rows:
+            binding = {v: self.names[i] for v, i in zip(variables, row)}
+            covered.add(tuple(binding.get(term, term) for term in head))
+
+        return covered
+
+    def score(self, clause):
+        """Coverage of a clause on the positive and negative examples"""
+
+        if isinstance(clause, str):
+            clause = parse_clause(clause)
+
+        positive = len(self.covered_ids(clause, self.positive)[1])
+        negative = len(self.covered_ids(clause, self.negative)[1])
+        covered = positive + negative
+
+        return {'clause': format_clause(clause),
+                'positive': positive,
+                'negative': negative,
+                'n_positive': len(self.positive),
+                'n_negative': len(self.negative),
+                'precision': positive / covered if covered else 0.0}
+
+    def score_all(self, clauses):
+        """Score many clauses, the indices are shared between them"""
+
+        start = time.perf_counter()
+        scores = [self.score(clause) for clause in clauses]
+        seconds = time.perf_counter() - start
+        print(f'[+] Scored {len(scores)} clauses in {seconds * 1000:.1f} ms')
+
+        return scores
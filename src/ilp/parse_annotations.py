@@ -7,6 +7,7 @@ import pathlib
 import pandas as pd
 import xml.etree.ElementTree as ET
 import pickle
+from multiprocessing import Pool
 
 from tqdm import tqdm
 
@@ -14,63 +15,148 @@ import config
 from ilp.structures.feature_type import FeatureType
 from ilp.structures.feature import Feature
 from ilp.structures.sample import Sample
+from ilp.structures.sample_collection import SampleCollection
+from ilp.sample_store import SampleStore
+from heatmapping.heatmap_store import HeatmapStore
 from helpers.img import name_to_path
 
 
-def parse_file(filepath, heatmap, orig_file, meta, show):
-    """Parse a single image"""
+def read_annotation(filepath, size=config.annotation_size):
+    """Read the objects of a VOC xml file as compact records
+
+    Parameters
+    ----------
+    size : tuple
+        (height, width) the boxes are scaled to from the size of the
+        annotated image, unchanged if the file has no size
+
+    Returns
+    -------
+    objects : list
+        Tuple (feature type value, xmin, ymin, xmax, ymax) per object
+    """
     tree = ET.parse(filepath)
     root = tree.getroot()
 
-    filename = root.find('filename').text
-    features = []
+    scale_x = scale_y = 1
+    width = root.find('size/width')
+    height = root.find('size/height')
+    if width is not None and height is not None \
+            and int(width.text) > 0 and int(height.text) > 0:
+        scale_x = size[1] / int(width.text)
+        scale_y = size[0] / int(height.text)
 
+    objects = []
     for obj in root.iter('object'):
 
-        # type of the object
-        obj_type = obj.find('name').text
-
-        # Coordinates defining the object
+        # type of the object and the coordinates defining the object
         #   this is the bounding box for e.g. a nose
-        coordinates = {
-            'xmin': int(obj.find('bndbox/xmin').text),
-            'xmax': int(obj.find('bndbox/xmax').text),
-            'ymin': int(obj.find('bndbox/ymin').text),
-            'ymax': int(obj.find('bndbox/ymax').text)
-        }
+        objects.append((FeatureType[obj.find('name').text].value,
+                        round(int(obj.find('bndbox/xmin').text) * scale_x),
+                        round(int(obj.find('bndbox/ymin').text) * scale_y),
+                        round(int(obj.find('bndbox/xmax').text) * scale_x),
+                        round(int(obj.find('bndbox/ymax').text) * scale_y)))
+
+    return objects
+
+
+def read_annotations(filepaths, processes=None, chunksize=64):
+    """Read many annotation files in parallel
+
+    Parameters
+    ----------
+    processes : int
+        Number of worker processes, 1 reads in the current process and
+        None uses all cores
+
+    Returns
+    -------
+    generator
+        Yields the objects of each file (see read_annotation) in the
+        order of filepaths
+    """
 
-        feature = Feature(coordinates, FeatureType[obj_type])
-        features.append(feature)
+    if processes == 1:
+        yield from map(read_annotation, filepaths)
+    else:
+        with Pool(processes) as pool:
+            yield from pool.imap(read_annotation, filepaths, chunksize)
+
+
+def create_sample(objects, heatmap, orig_file, meta, show=False, store=None):
+    """Create a Sample from the records of read_annotation
+
+    Parameters
+    ----------
+    meta : dict
+        Row of the prediction DataFrame for the image with ground_truth,
+        prediction and predicted_class
+    """
+
+    features = [Feature({'xmin': xmin, 'xmax': xmax,
+                         'ymin': ymin, 'ymax': ymax}, FeatureType(kind))
+                for kind, xmin, ymin, xmax, ymax in objects]
 
     sample = Sample(features=features,
-                    ground_truth=meta['ground_truth'].iloc[0].item(),
-                    prediction=meta['prediction'].iloc[0].item(),
-                    predicted_class=meta['predicted_class'].iloc[0].item(),
+                    ground_truth=int(meta['ground_truth']),
+                    prediction=float(meta['prediction']),
+                    predicted_class=int(meta['predicted_class']),
                     heatmap=heatmap,
                     orig_file=orig_file
                     )
     if show:
-        sample.show()
+        sample.show(store)
 
     return sample
 
 
-def parse(show=False):
+def parse_file(filepath, heatmap, orig_file, meta, show, store=None):
+    """Parse a single image"""
+    return create_sample(read_annotation(filepath), heatmap, orig_file, meta,
+                         show, store)
+
+
+def parse(show=False, resume=False, processes=config.annotation_workers):
+    """Create a Sample for every heatmap with an annotation
+
+    Every sample is appended to the SampleStore once it has been parsed.
+    Once all annotations have been parsed, the samples are written as
+    SampleCollection, which is read by generate_aleph.py, and as
+    samples.p, a pickled list of Sample objects.
+
+    Parameters
+    ----------
+    resume : bool
+        Keep the samples stored by a previous, e.g. interrupted, run and
+        only parse the annotations that are not stored yet
+
+    processes : int
+        Number of processes reading the annotation files
+    """
 
     df_path = os.path.sep.join([config.ilp_path, 'pickles', 'df.p'])
     df = pd.read_pickle(df_path)
     print(f'[+] Got {len(df)} files')
 
-    samples = []
-
-    try:
-        heatmaps = os.listdir(config.heatmap_path)
-    except FileNotFoundError:
-        print('[!] No heatmaps, generate them first.', file=sys.stderr)
-        raise
+    # rows of the df by the relative filename of the original image
+    metadata = df.set_index('filename').to_dict('index')
+
+    # prefer the raw relevance maps, the rendered heatmaps are only
+    #   needed in case no relevance store has been written
+    store = HeatmapStore(config.relevance_path)
+    if store.exists():
+        store.warn_outdated()
+        heatmaps = store.open().filenames
+    else:
+        store = None
+        try:
+            heatmaps = os.listdir(config.heatmap_path)
+        except FileNotFoundError:
+            print('[!] No heatmaps, generate them first.', file=sys.stderr)
+            raise
 
     try:
-        annotations = os.listdir(config.annotation_path)
+        annotations = set(os.listdir(config.annotation_path))
         print(f'[+] Got {len(annotations)} annotations')
     except FileNotFoundError:
         print('[!] No annotations found. They need to be created manually'
@@ -78,36 +164,54 @@ def parse(show=False):
               ' directory.', file=sys.stderr)
         raise
 
-    print('[*] Parsing annotations')
-    for hmap in tqdm(heatmaps):
+    sample_store = SampleStore(config.sample_store_path).open(reset=not resume)
+    if resume:
+        print(f'[+] Resuming with {len(sample_store)} stored samples')
 
-        # Construct full file paths
-        hmap_path = os.path.sep.join([config.heatmap_path, hmap])
-        orig_file = name_to_path(hmap, config.test)
+    # collect the heatmaps with an annotation that still need a sample
+    jobs = []
+    for hmap in heatmaps:
+
+        if hmap in sample_store:
+            continue
 
         # Get the heatmap base filename
-        hmap_base = pathlib.Path(hmap_path).stem
+        hmap_base = pathlib.Path(hmap).stem
 
         # Add only if annotations for heatmap exists
         if hmap_base+'.xml' in annotations:
+            jobs.append((hmap, os.path.sep.join([config.annotation_path,
+                                                 hmap_base+'.xml'])))
+
+    print(f'[*] Parsing {len(jobs)} annotations')
+    objects = read_annotations([annotation for hmap, annotation in jobs],
+                               processes=processes)
+
+    for (hmap, annotation), hmap_objects in tqdm(zip(jobs, objects),
+                                                 total=len(jobs)):
+
+        # Construct full file paths
+        hmap_path = os.path.sep.join([config.heatmap_path, hmap])
+        orig_file = name_to_path(hmap, config.test)
 
-            # Get the according annotation
-            annotation = os.path.sep.join([config.annotation_path,
-                                           hmap_base+'.xml'])
+        # filename is stored relative inside the dataframe
+        p = pathlib.Path(orig_file)
+        rel_orig_file = os.path.join(*p.parts[-2:])
 
-            # filename is stored relative inside the dataframe
-            p = pathlib.Path(orig_file)
-            rel_orig_file = os.path.join(*p.parts[-2:])
+        sample = create_sample(hmap_objects,
+                               heatmap=hmap_path,
+                               orig_file=orig_file,
+                               meta=metadata[rel_orig_file],
+                               show=show,
+                               store=store)
+        sample_store.append(hmap, sample)
 
-            # Part of the df relevant for this annotation
-            hmap_df = df[df['filename'] == rel_orig_file]
+    sample_store.close()
 
-            samples.append(parse_file(filepath=annotation,
-                                      heatmap=hmap_path,
-                                      orig_file=orig_file,
-                                      meta=hmap_df,
-                                      show=show))
+    output_path = os.path.sep.join([config.pickle_path, 'samples.p'])
+    with open(output_path, 'wb') as f:
+        pickle.dump(list(sample_store), f, pickle.HIGHEST_PROTOCOL)
 
-            output_path = os.path.sep.join([config.pickle_path, 'samples.p'])
-            with open(output_path, 'wb') as f:
-                pickle.dump(samples, f, pickle.HIGHEST_PROTOCOL)
+    collection = SampleCollection.from_samples(sample_store)
+    collection.save(config.sample_collection_path)
+    print(f'[+] Stored {len(sample_store)} samples')
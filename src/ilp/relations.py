@@ -0,0 +1,183 @@
+"""Vectorized spatial relations between bounding boxes
+
+The binary predicates in ilp.structures.predicates compare the
+axis-aligned bounding boxes of two features. For rectangles all of these
+relations reduce to comparisons of the coordinates, which are computed
+here for many pairs at once. Boxes are arrays with the columns
+xmin, ymin, xmax, ymax, as in SampleCollection.bboxes.
+
+The results match shapely for boxes with a positive area. The kernels of
+the predicates are registered in ilp.structures.predicates.
+"""
+
+import numpy as np
+
+
+def split(boxes):
+    boxes = np.asarray(boxes, dtype=np.int32)
+    return boxes[..., 0], boxes[..., 1], boxes[..., 2], boxes[..., 3]
+
+
+def intersects(a, b):
+    """Boxes share at least one point, including touching edges"""
+    axmin, aymin, axmax, aymax = split(a)
+    bxmin, bymin, bxmax, bymax = split(b)
+    return ((axmin <= bxmax) & (bxmin <= axmax)
+            & (aymin <= bymax) & (bymin <= aymax))
+
+
+def disjoint(a, b):
+    """Boxes share no point"""
+    return ~intersects(a, b)
+
+
+def contains(a, b):
+    """b lies completely inside of a, edges may touch"""
+    axmin, aymin, axmax, aymax = split(a)
+    bxmin, bymin, bxmax, bymax = split(b)
+    return ((axmin <= bxmin) & (bxmax <= axmax)
+            & (aymin <= bymin) & (bymax <= aymax))
+
+
+def overlaps(a, b):
+    """Interiors intersect but neither box contains the other"""
+    axmin, aymin, axmax, aymax = split(a)
+    bxmin, bymin, bxmax, bymax = split(b)
+    interiors = ((axmin < bxmax) & (bxmin < axmax)
+                 & (aymin < bymax) & (bymin < aymax))
+    return interiors & ~contains(a, b) & ~contains(b, a)
+
+
+def left_of(a, b, tolerance):
+    """Center of a is more than tolerance px left of the center of b"""
+    axmin, aymin, axmax, aymax = split(a)
+    bxmin, bymin, bxmax, bymax = split(b)
+    # compare doubled centers to stay in integers
+    return axmin + axmax < bxmin + bxmax - 2 * tolerance
+
+
+def top_of(a, b, tolerance):
+    """Center of a is more than tolerance px above the center of b"""
+    axmin, aymin, axmax, aymax = split(a)
+    bxmin, bymin, bxmax, bymax = split(b)
+    return aymin + aymax < bymin + bymax - 2 * tolerance
+
+
+def pairs(offsets):
+    """All ordered pairs of different features within each sample
+
+    Parameters
+    ----------
+    offsets : numpy.ndarray
+        Features of sample i are offsets[i]:offsets[i+1]
+
+    Returns
+    -------
+    a, b : numpy.ndarray
+        Feature indices of the pairs, ordered by sample, a and then b
+
+    pair_offsets : numpy.ndarray
+        Pairs of sample i are pair_offsets[i]:pair_offsets[i+1]
+    """
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    sizes = np.diff(offsets)
+    sample = np.repeat(np.arange(len(sizes)), sizes)
+
+    # every feature is paired with all features of its sample
+    partners = sizes[sample]
+    a = np.repeat(np.arange(offsets[-1]), partners)
+    starts = np.cumsum(partners) - partners
+    b = offsets[sample[a]] + np.arange(len(a)) - np.repeat(starts, partners)
+
+    # don't calculate relations with self
+    other = a != b
+    pair_offsets = np.concatenate([[0], np.cumsum(sizes * (sizes - 1))])
+
+    return a[other], b[other], pair_offsets
+
+
+def reverse_pairs(a, b, offsets, pair_offsets):
+    """Index of the pair (b, a) for every pair (a, b) returned by pairs"""
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    sample = np.searchsorted(offsets, a, side='right') - 1
+    n = np.diff(offsets)[sample]
+    i = a - offsets[sample]
+    j = b - offsets[sample]
+
+    # pairs of a sample are ordered by a, then b without a itself
+    return pair_offsets[sample] + j * (n - 1) + np.where(i < j, i, i - 1)
+
+
+def relation_matrices(bboxes, kernels):
+    """All relations between the features of a single sample
+
+    Parameters
+    ----------
+    kernels : dict
+        Vectorized kernel by predicate name, see
+        ilp.structures.predicates.kernels
+
+    Returns
+    -------
+    relations : dict
+        Boolean (n, n) matrix per predicate name, entry [i, j] is the
+        relation of feature i to feature j. The diagonal is False.
+    """
+
+    bboxes = np.asarray(bboxes)
+    a = bboxes[:, np.newaxis, :]
+    b = bboxes[np.newaxis, :, :]
+    self_pairs = np.eye(len(bboxes), dtype=bool)
+
+    return {name: kernel(a, b) & ~self_pairs
+            for name, kernel in kernels.items()}
+
+
+def pair_relations(bboxes, offsets, kernels, symmetric=()):
+    """All relations for the feature pairs of many samples at once
+
+    Parameters
+    ----------
+    bboxes : numpy.ndarray
+        Boxes of all features, e.g. SampleCollection.bboxes
+
+    offsets : numpy.ndarray
+        Features of sample i are offsets[i]:offsets[i+1]
+
+    kernels : dict
+        Vectorized kernel by predicate name
+
+    symmetric : collection
+        Names of the symmetric predicates, these are only evaluated once
+        per unordered pair and mirrored to the reverse pair
+
+    Returns
+    -------
+    a, b, pair_offsets : numpy.ndarray
+        The pairs as returned by pairs
+
+    relations : dict
+        Boolean array per predicate name, True if the relation holds for
+        the pair (a, b)
+    """
+
+    a, b, pair_offsets = pairs(offsets)
+    bboxes = np.asarray(bboxes)
+
+    upper = a < b
+    if any(name in symmetric for name in kernels):
+        reverse = reverse_pairs(a, b, offsets, pair_offsets)[upper]
+
+    relations = {}
+    for name, kernel in kernels.items():
+        if name in symmetric:
+            holds = np.zeros(len(a), dtype=bool)
+            holds[upper] = kernel(bboxes[a[upper]], bboxes[b[upper]])
+            holds[reverse] = holds[upper]
+        else:
+            holds = kernel(bboxes[a], bboxes[b])
+        relations[name] = holds
+
+    return a, b, pair_offsets, relations
@@ -0,0 +1,148 @@
+"""Relevance statistics of the annotated parts
+
+For every feature the relevance inside its bounding box is summarized from
+the raw relevance maps of the HeatmapStore. Sums are read from summed-area
+tables (integral images), so every box costs four lookups regardless of its
+size. The maximum has no such table and is taken from a slice of the map.
+
+Boxes are in pixels of the relevance map, columns xmin:xmax and rows
+ymin:ymax, clipped to the map.
+"""
+
+import os
+
+import numpy as np
+
+# statistics per feature, see relevance_stats
+STATS = ('sum', 'mean', 'max', 'positive', 'negative', 'share',
+         'positive_share')
+
+
+def integral_images(maps):
+    """Summed-area tables of a batch of maps
+
+    Returns
+    -------
+    numpy.ndarray
+        (n, h + 1, w + 1) float64, entry [i, y, x] is the sum of
+        maps[i, :y, :x]
+    """
+
+    tables = np.zeros((len(maps), maps.shape[1] + 1, maps.shape[2] + 1))
+    tables[:, 1:, 1:] = maps
+    # in place, without temporary arrays
+    np.cumsum(tables, axis=1, out=tables)
+    np.cumsum(tables, axis=2, out=tables)
+
+    return tables
+
+
+def box_sums(tables, images, bboxes):
+    """Sum inside many boxes from summed-area tables
+
+    Parameters
+    ----------
+    tables : numpy.ndarray
+        Output of integral_images
+
+    images : numpy.ndarray
+        Index of the table of each box
+
+    bboxes : numpy.ndarray
+        Clipped boxes with the columns xmin, ymin, xmax, ymax
+    """
+
+    xmin, ymin, xmax, ymax = bboxes.T
+    return (tables[images, ymax, xmax] - tables[images, ymin, xmax]
+            - tables[images, ymax, xmin] + tables[images, ymin, xmin])
+
+
+def box_max(maps, images, bboxes):
+    """Maximum inside each box, NaN for empty boxes"""
+
+    result = np.full(len(bboxes), np.nan)
+    for i, (image, (xmin, ymin, xmax, ymax)) in enumerate(zip(images,
+                                                              bboxes)):
+        if xmax > xmin and ymax > ymin:
+            result[i] = maps[image, ymin:ymax, xmin:xmax].max()
+
+    return result
+
+
+def relevance_stats(samples, store, chunk_size=64):
+    """Relevance statistics for every feature of a SampleCollection
+
+    Parameters
+    ----------
+    samples : SampleCollection
+
+    store : HeatmapStore
+        Opened store with the relevance maps of the samples
+
+    chunk_size : int
+        Number of relevance maps summarized at once
+
+    Returns
+    -------
+    stats : dict
+        float32 array per name in STATS, aligned with samples.bboxes:
+        sum, mean and max of the relevance in the box, positive and
+        negative (absolute) mass in the box, share of the total relevance
+        of the whole map inside the box and the same share of the positive
+        mass. Shares of maps with a total of 0 are 0. Features of samples
+        without a relevance map are NaN.
+    """
+
+    n_features = len(samples.kinds)
+    stats = {name: np.full(n_features, np.nan, dtype=np.float32)
+             for name in STATS}
+    if not n_features:
+        return stats
+
+    # relevance map of every feature, -1 if the store has none
+    maps = np.array([store.index.get(os.path.basename(heatmap), -1)
+                     for heatmap in samples.heatmaps.astype(str)],
+                    dtype=np.int64)
+    feature_maps = maps[samples.sample_index]
+
+    height, width = store.relevance.shape[1:]
+    bboxes = np.asarray(samples.bboxes, dtype=np.int64).copy()
+    bboxes[:, [0, 2]] = np.clip(bboxes[:, [0, 2]], 0, width)
+    bboxes[:, [1, 3]] = np.clip(bboxes[:, [1, 3]], 0, height)
+    area = ((bboxes[:, 2] - bboxes[:, 0]).clip(min=0)
+            * (bboxes[:, 3] - bboxes[:, 1]).clip(min=0))
+    # empty boxes have the same corners, so their sums are 0
+    bboxes[:, 2] = np.maximum(bboxes[:, 2], bboxes[:, 0])
+    bboxes[:, 3] = np.maximum(bboxes[:, 3], bboxes[:, 1])
+
+    # read the maps in store order
+    needed = np.unique(maps[maps >= 0])
+    for start in range(0, len(needed), chunk_size):
+        chunk = needed[start:start + chunk_size]
+        relevance = np.asarray(store.relevance[chunk], dtype=np.float32)
+
+        features = np.flatnonzero(np.isin(feature_maps, chunk))
+        images = np.searchsorted(chunk, feature_maps[features])
+        boxes = bboxes[features]
+
+        # tables of the relevance and of its positive part at once
+        positive_maps = np.maximum(relevance, 0)
+        tables = integral_images(np.concatenate([relevance, positive_maps]))
+        total = box_sums(tables, images, boxes)
+        positive = box_sums(tables, images + len(chunk), boxes)
+        negative = positive - total
+        map_total = tables[:len(chunk), -1, -1][images]
+        positive_total = tables[len(chunk):, -1, -1][images]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats['sum'][features] = total
+            stats['mean'][features] = total / area[features]
+            stats['max'][features] = box_max(relevance, images, boxes)
+            stats['positive'][features] = positive
+            stats['negative'][features] = negative
+            stats['share'][features] = np.where(
+                map_total != 0, total / map_total, 0)
+            stats['positive_share'][features] = np.where(
+                positive_total > 0, positive / positive_total, 0)
+
+    return stats
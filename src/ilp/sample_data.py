@@ -2,18 +2,19 @@
 
     1. Load the test set generator
     2. Make predictions on the test set
-    3. Pick n samples per class closest to the descision boundary based on the
-        predictions
-    4. Copy the samples into a new folder
+    3. Pick n samples per class based on the predictions, by default those
+        closest to the descision boundary
+    4. Store the selected samples, see data_loaders.selection
 
 """
 import os
-import shutil
 
+import numpy as np
 import pandas as pd
 
 import config
-import helpers
+from helpers.predict import predict
+from data_loaders.selection import Selection
 
 
 def make_predictions(data, model, info):
@@ -21,9 +22,8 @@ def make_predictions(data, model, info):
 
     # Predictions
     print('[*] Making predictions on test set, this may take a while')
-    data.reset()
-    steps = (info['n_test'] // config.batch_size) + 1
-    predictions = model.predict_generator(data, steps=steps)
+    # one prediction per image of the flow, aligned to data.filenames
+    predictions = np.ravel(predict(model, data))
     print(f'[+] Got {len(predictions)} predictions')
 
     # Summary Information
@@ -45,7 +45,8 @@ def make_predictions(data, model, info):
     df['filename'] = filenames
     df['ground_truth'] = ground_truth
     df['prediction'] = predictions
-    df['predicted_class'] = df['prediction'].apply(lambda x: round(x))
+    # rounds half to even like round
+    df['predicted_class'] = np.rint(predictions).astype(int)
 
     print(df)
 
@@ -57,8 +58,75 @@ def make_predictions(data, model, info):
     return df
 
 
-def pick_images(df, only_correct=False, n=50):
-    """Pick the images closest to the descision boundary per class
+def top_k(values, k):
+    """Indices of the k smallest values in ascending order of the values,
+    without sorting all values"""
+
+    k = min(k, len(values))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+
+    smallest = np.argpartition(values, k - 1)[:k]
+    return smallest[np.argsort(values[smallest], kind='stable')]
+
+
+def select(predictions, n, strategy='boundary', bins=config.selection_bins,
+           seed=config.seed):
+    """Select n predictions of one class
+
+    Parameters
+    ----------
+    predictions : numpy.ndarray
+        Model outputs of the candidates
+
+    strategy : str
+        'boundary': the n predictions closest to the descision boundary
+        'stratified': the same number of random predictions from each of
+            the bins of equal width of the confidence, bins with too few
+            predictions are filled up from the other bins
+        'random': n random predictions
+
+    bins : int
+        Number of confidence bins of the stratified strategy
+
+    Returns
+    -------
+    numpy.ndarray
+        Indices of the selected predictions
+    """
+
+    predictions = np.asarray(predictions, dtype=np.float64)
+    confidence = np.abs(predictions - 0.5)
+
+    if strategy == 'boundary':
+        return top_k(confidence, n)
+
+    random_state = np.random.RandomState(seed)
+    if strategy == 'random':
+        return random_state.permutation(len(predictions))[:n]
+
+    if strategy == 'stratified':
+        # confidence is in [0, 0.5]
+        bin_index = np.minimum((confidence * 2 * bins).astype(np.int64),
+                               bins - 1)
+        # the first n members of each bin in a random order
+        order = random_state.permutation(len(predictions))
+        shuffled_bins = bin_index[order]
+        members = [order[shuffled_bins == b][:n] for b in range(bins)]
+        rank = np.concatenate([np.arange(len(m)) for m in members])
+        member_bins = np.repeat(np.arange(bins), [len(m) for m in members])
+
+        # round robin over the bins
+        return np.concatenate(members)[np.lexsort((member_bins, rank))[:n]]
+
+    raise ValueError(f'Unknown selection strategy {strategy}, '
+                     "use 'boundary', 'stratified' or 'random'")
+
+
+def pick_images(df, only_correct=False, n=50,
+                strategy=config.selection_strategy):
+    """Pick the images per class, by default those closest to the
+    descision boundary
 
     Parameters
     ----------
@@ -75,6 +143,11 @@ def pick_images(df, only_correct=False, n=50):
 
     n : int
         Number of images per class
+
+    strategy : str
+        How to select the images of a class, see select. The selected
+        positives are sorted by ascending and the negatives by descending
+        prediction.
     """
 
     # Make sure n is divideable by 10
@@ -83,27 +156,28 @@ def pick_images(df, only_correct=False, n=50):
 
     print(f'[*] Picking images')
 
-    # Selective for false outputs
-    pred_0 = df['predicted_class'] == 0
-    pred_1 = df['predicted_class'] == 1
-
-    gt_0 = df['ground_truth'] == 0
-    gt_1 = df['ground_truth'] == 1
+    predicted = df['predicted_class'].values
+    truth = df['ground_truth'].values
+    prediction = df['prediction'].values
 
-    false_positive = df[pred_1 & gt_0]
-    false_negative = df[pred_0 & gt_1]
+    # Selective for false outputs
+    false_positive = df[(predicted == 1) & (truth == 0)]
+    false_negative = df[(predicted == 0) & (truth == 1)]
 
     # General output
     # predictions that are correct
-    if only_correct:
-        df = df[df['ground_truth'] == df['predicted_class']]
+    candidates = (predicted == truth) if only_correct \
+        else np.ones(len(df), dtype=bool)
 
-    positive = df[df['predicted_class'] == 1]
-    negative = df[df['predicted_class'] == 0]
+    selections = []
+    for predicted_class, sign in [(1, 1), (0, -1)]:
+        rows = np.flatnonzero(candidates & (predicted == predicted_class))
+        rows = rows[select(prediction[rows], n, strategy)]
+        # positives ascending, negatives descending by prediction
+        rows = rows[np.argsort(sign * prediction[rows], kind='stable')]
+        selections.append(df.iloc[rows])
 
-    # Select only the n values closest to the descion boundary
-    positive = positive.sort_values(by='prediction', ascending=True).head(n)
-    negative = negative.sort_values(by='prediction', ascending=False).head(n)
+    positive, negative = selections
 
     print(positive)
     print(negative)
@@ -118,8 +192,9 @@ def filename_lists(positive, negative, false_positive, false_negative):
             false_negative['filename'].tolist())
 
 
-def copy_images(selections, classes=['pos', 'neg', 'fp', 'fn']):
-    """Copy the selected images into a new folder
+def store_selection(selections, classes=['pos', 'neg', 'fp', 'fn'],
+                    mode=config.selection_mode):
+    """Store the selected images without copying them
 
     Parameters
     ----------
@@ -129,37 +204,39 @@ def copy_images(selections, classes=['pos', 'neg', 'fp', 'fn']):
 
     classes : List
         List of strings for the classes that shall be saved
-    """
-
-    print('[*] Copying images')
 
-    for images, image_class in zip(selections, classes):
+    mode : str
+        'manifest' only writes the list of the selected test set files,
+        'hardlink', 'symlink' and 'copy' also fill the class folders of
+        ilp_img_path
+    """
 
-        # Prepare paths
-        path = os.path.sep.join([config.ilp_img_path, image_class])
+    print(f'[*] Storing the selected images in {config.selection_path}')
 
-        # Create the folders in case they don't exist
-        os.makedirs(path, exist_ok=True)
+    selection = Selection()
+    selection.set(selections, classes, config.test)
+    selection.save()
 
-        for img in images:
+    if mode != 'manifest':
+        print(f'[*] Adding the images to {config.ilp_img_path} ({mode})')
+        selection.link(config.ilp_img_path, mode)
 
-            filename = helpers.img.path_to_name(img)
-            shutil.copy(os.path.sep.join([config.test, img]),
-                        os.path.sep.join([path, filename])
-                        )
+    print(f'[+] Selected {selection.count()} images')
 
 
-def sample(test, vgg, info, n=50, only_correct=False):
+def sample(test, vgg, info, n=50, only_correct=False,
+           strategy=config.selection_strategy, mode=config.selection_mode):
     """ Main method for starting calling the sampling"""
     prediction_df = make_predictions(test, vgg.model, info)
 
     positive, negative,\
         false_positive, false_negative = pick_images(prediction_df, n=n,
-                                                     only_correct=only_correct)
+                                                     only_correct=only_correct,
+                                                     strategy=strategy)
 
     # Returns the filenames as a tuples of lists
     selections = filename_lists(positive,
                                 negative,
                                 false_positive,
                                 false_negative)
-    copy_images(selections)
+    store_selection(selections, mode=mode)
@@ -0,0 +1,163 @@
+"""Append-only store for parsed samples
+
+Every sample is appended as a length-prefixed pickle record, so each
+sample is written once and an interrupted run can be resumed with the
+samples that have already been stored. An index with the offset of each
+sample is written when the store is closed. If the index is missing or
+outdated, e.g. after an interruption, it is rebuilt from the records.
+"""
+
+import os
+import json
+import pickle
+import struct
+
+HEADER = struct.Struct('<Q')  # length of the following record in bytes
+
+
+class SampleStore():
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the store without extension, the records are stored in
+            path.records and the index in path.index.json
+        """
+
+        self.records_path = path + '.records'
+        self.index_path = path + '.index.json'
+        self.index = {}
+        self.file = None
+
+    def open(self, reset=False):
+        """Open the store for appending
+
+        Parameters
+        ----------
+        reset : bool
+            Remove all samples that have been stored before
+        """
+
+        os.makedirs(os.path.dirname(self.records_path) or '.', exist_ok=True)
+        if reset:
+            for path in [self.records_path, self.index_path]:
+                if os.path.isfile(path):
+                    os.remove(path)
+
+        self.load_index()
+        self.file = open(self.records_path, 'ab')
+
+        return self
+
+    def load_index(self):
+        """Load the index, rebuild it if it does not match the records"""
+
+        if not os.path.isfile(self.records_path):
+            self.index = {}
+            return self.index
+
+        size = os.path.getsize(self.records_path)
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            if index['size'] == size:
+                self.index = index['offsets']
+                return self.index
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+        return self.rebuild_index()
+
+    def rebuild_index(self):
+        """Scan all records, a partially written last record is removed"""
+
+        self.index = {}
+        end = 0
+        with open(self.records_path, 'rb') as f:
+            for key, sample, offset in self.read_records(f):
+                self.index[key] = offset
+                end = f.tell()
+
+        with open(self.records_path, 'r+b') as f:
+            f.truncate(end)
+
+        return self.index
+
+    @staticmethod
+    def read_records(f):
+        """Yield (key, sample, offset) for every complete record of a file"""
+
+        while True:
+            offset = f.tell()
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            data = f.read(HEADER.unpack(header)[0])
+            try:
+                key, sample = pickle.loads(data)
+            except (EOFError, pickle.UnpicklingError):
+                return
+            yield key, sample, offset
+
+    def append(self, key, sample):
+        """Write a single sample at the end of the store"""
+
+        data = pickle.dumps((key, sample), pickle.HIGHEST_PROTOCOL)
+        self.index[key] = self.file.tell()
+        self.file.write(HEADER.pack(len(data)) + data)
+        # flushed, so the record survives an interruption of the run
+        self.file.flush()
+
+    def checkpoint(self):
+        """Write the index for the records stored so far"""
+
+        self.file.flush()
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'size': self.file.tell(), 'offsets': self.index}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def close(self):
+        if self.file is not None:
+            self.checkpoint()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, key):
+        """Read a single sample by key"""
+        with open(self.records_path, 'rb') as f:
+            f.seek(self.index[key])
+            return next(self.read_records(f))[1]
+
+    def __iter__(self):
+        """Read the samples one by one in the order they were stored
+
+        If a key has been stored several times only the last sample counts
+        """
+
+        if self.file is None:
+            self.load_index()
+        else:
+            self.file.flush()
+
+        if not os.path.isfile(self.records_path):
+            return
+
+        with open(self.records_path, 'rb') as f:
+            for key, sample, offset in self.read_records(f):
+                if self.index.get(key) == offset:
+                    yield sample
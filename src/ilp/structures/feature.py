@@ -1,8 +1,11 @@
+"""Classes to represent annotated heatmaps in python"""
 from shapely.geometry import Polygon
 
 
 class Feature():
 
+    __slots__ = ('coordinates', 'kind', '_polygon')
+
     def __init__(self, coordinates, kind):
         """Create new feature
 
@@ -18,8 +21,27 @@ class Feature():
 
         self.coordinates = coordinates
         self.kind = kind
-        self.polygon = Feature.construct_polygon(coordinates)
-
+        self._polygon = None
+
+    @property
+    def polygon(self):
+        """Shapely polygon of the bounding box, built on first access"""
+        if self._polygon is None:
+            self._polygon = Feature.construct_polygon(self.coordinates)
+        return self._polygon
+
+    def __getstate__(self):
+        # the polygon can be rebuilt from the coordinates
+        return self.coordinates, self.kind
+
+    def __setstate__(self, state):
+        # pickles of older versions store the __dict__ with the polygon
+        if isinstance(state, dict):
+            state = state['coordinates'], state['kind']
+        self.coordinates, self.kind = state
+        self._polygon = None
+
+    @staticmethod
     def construct_polygon(coordinates):
         """Construct a shapely polygon given coordinates"""
         # Shapely expects ordered sequence of (x, y[, z]) point tuples
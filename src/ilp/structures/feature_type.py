@@ -7,6 +7,8 @@ class FeatureType(Enum):
     nose = 2
     mouth = 3
     face_frame = 4
+    # relevant region proposed from a heatmap, see generate_proposals.py
+    region = 5
 
     def __str__(self):
         # return the name of the own feature type
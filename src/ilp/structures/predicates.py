@@ -4,10 +4,123 @@ Terminology:
     organ: Object class, e.g. nose
     part: Organ in a specific example
 
+Predicates are kept in a registry by name. generate_aleph.py writes the
+predicates named in config.aleph_predicates, further predicates can be
+added by plugin modules listed in config.predicate_modules, which
+register them with the register decorator.
+
 """
 
+import importlib
+
+import config
+from ilp import relations
+
+# registered predicates by name
+REGISTRY = {}
+
+
+def register(predicate):
+    """Class decorator adding a predicate to the registry"""
+    REGISTRY[predicate.name] = predicate
+    return predicate
+
+
+def load(names=config.aleph_predicates, modules=config.predicate_modules):
+    """Get predicates from the registry
+
+    Parameters
+    ----------
+    names : list
+        Names of the predicates in the order of the modes and
+        determinations, None for all registered predicates
+
+    modules : list
+        Plugin modules which are imported first, so they can register
+        their predicates
+    """
+
+    for module in modules:
+        importlib.import_module(module)
+
+    if names is None:
+        return list(REGISTRY.values())
+
+    unknown = [name for name in names if name not in REGISTRY]
+    if unknown:
+        raise ValueError(f'Unknown predicates {unknown}, registered are '
+                         f'{list(REGISTRY)}')
+
+    return [REGISTRY[name] for name in names]
+
+
+def kernels(preds):
+    """Vectorized kernel by name of the binary predicates"""
+    return {pred.name: pred.kernel for pred in preds
+            if pred.type == 'binary'}
+
+
+def fact_name(predicate, symmetric_facts):
+    """Name of the facts written for a predicate
+
+    With symmetric_facts 'rule' the facts of a symmetric predicate are
+    written as name_fact and the predicate itself is derived by the
+    closure rules.
+    """
+    if predicate.symmetric and symmetric_facts == 'rule':
+        return predicate.name + '_fact'
+    return predicate.name
+
+
+# comment naming the symmetric predicates whose facts are written once per
+#   unordered pair with symmetric_facts 'once', read back by coverage.py
+ONCE_COMMENT = '% facts once per unordered pair: '
+
+
+def once_comment(predicates):
+    """Comment listing the symmetric predicates written once per pair"""
+    return ONCE_COMMENT + ', '.join(sorted(pred.name for pred in predicates))
+
+
+def declarations(predicate):
+    """Declare the facts of a symmetric predicate, so the closure rules
+    do not raise an existence error if no fact is written, and the facts
+    may be spread over the samples"""
+    fact = f'{predicate.name}_fact/{predicate.arity}'
+    return [f':- dynamic {fact}.',
+            f':- discontiguous {fact}.']
+
+
+def closure(predicate):
+    """Rules deriving a symmetric predicate from facts stored once per
+    unordered pair"""
+    fact = predicate.name + '_fact'
+    return [f'{predicate.name}(A, B) :- {fact}(A, B).',
+            f'{predicate.name}(A, B) :- {fact}(B, A).']
+
 
 class Predicate():
+    """Base class of the predicates
+
+    The kernel of a predicate calculates it for many features at once,
+    its signature depends on the type:
+
+        binary: kernel(a, b) with arrays of the bounding boxes xmin,
+            ymin, xmax, ymax in the last axis of the first and the second
+            features, broadcast against each other. Returns a boolean
+            array of the broadcast shape, see ilp.relations
+        unary: kernel(stats) with the dict of the relevance statistics of
+            n features, see ilp.relevance_stats, returns a boolean array
+            with n entries
+    """
+
+    type = None
+    name = None
+    arity = None
+    # p(a, b) holds if and only if p(b, a) holds
+    symmetric = False
+    # vectorized calculation for many features, see above
+    kernel = None
 
     @staticmethod
     def calc():
@@ -30,10 +143,14 @@ class Predicate():
 
 # Binary Predicates
 
+
+@register
 class Contains(Predicate):
 
     type = 'binary'
     name = 'contains'
+    arity = 2
+    kernel = staticmethod(relations.contains)
 
     def calc(feature_a, feature_b, identifier):
         """See if a contains b or b contains a
@@ -55,10 +172,14 @@ class Contains(Predicate):
         return f':- determination(face/1, {Contains.name}/2).'
 
 
+@register
 class Overlaps(Predicate):
 
     type = 'binary'
     name = 'overlaps'
+    arity = 2
+    symmetric = True
+    kernel = staticmethod(relations.overlaps)
 
     def calc(feature_a, feature_b, identifier):
         """Calculate if a overlaps b or b overlaps a"""
@@ -73,10 +194,14 @@ class Overlaps(Predicate):
         return f':- determination(face/1, {Overlaps.name}/2).'
 
 
+@register
 class Intersects(Predicate):
 
     type = 'binary'
     name = 'intersects'
+    arity = 2
+    symmetric = True
+    kernel = staticmethod(relations.intersects)
 
     def calc(feature_a, feature_b, identifier):
         """Calculate if a intersects b"""
@@ -91,10 +216,14 @@ class Intersects(Predicate):
         return f':- determination(face/1, {Intersects.name}/2).'
 
 
+@register
 class Disjoint(Predicate):
 
     type = 'binary'
     name = 'disjoint'
+    arity = 2
+    symmetric = True
+    kernel = staticmethod(relations.disjoint)
 
     def calc(feature_a, feature_b, identifier):
         """Calculate if a overlaps b or b contains a"""
@@ -109,12 +238,18 @@ class Disjoint(Predicate):
         return f':- determination(face/1, {Disjoint.name}/2).'
 
 
+@register
 class LeftOf(Predicate):
 
     name = 'left_of'
     type = 'binary'
+    arity = 2
     tolerance = 5  # offest tolreance in px
 
+    @staticmethod
+    def kernel(a, b):
+        return relations.left_of(a, b, LeftOf.tolerance)
+
     @staticmethod
     def left_of(p1, p2):
         if p1.x < p2.x - LeftOf.tolerance:
@@ -143,12 +278,18 @@ class LeftOf(Predicate):
         return f':- determination(face/1, {LeftOf.name}/2).'
 
 
+@register
 class TopOf(Predicate):
 
     name = 'top_of'
     type = 'binary'
+    arity = 2
     tolerance = 5  # offest tolreance in px
 
+    @staticmethod
+    def kernel(a, b):
+        return relations.top_of(a, b, TopOf.tolerance)
+
     @staticmethod
     def top_of(p1, p2):
         if p1.y < p2.y - TopOf.tolerance:
@@ -178,11 +319,36 @@ class TopOf(Predicate):
 
 
 # Unariy Predicates
+@register
+class Relevant(Predicate):
+    """The part holds a large share of the positive relevance of the
+    example, needs the relevance maps of the HeatmapStore"""
+
+    type = 'unary'
+    name = 'relevant'
+    arity = 1
+    threshold = 0.2  # minimum share of the positive relevance
+
+    @staticmethod
+    def kernel(stats):
+        """Calculate for all features from their relevance statistics,
+        see ilp.relevance_stats"""
+        return stats['positive_share'] >= Relevant.threshold
+
+    def mode():
+        return f':- modeb(*, {Relevant.name}(+part)).'
+
+    def determination():
+        return f':- determination(face/1, {Relevant.name}/1).'
+
+
+@register
 class IsA(Predicate):
     """Classify the part in an example as some organ"""
 
     type = 'meta'
     name = 'is_a'
+    arity = 2
 
     def calc(identifier, feature):
         return f'{IsA.name}({identifier+str(feature.kind)}, {feature.kind}).'
@@ -194,11 +360,13 @@ class IsA(Predicate):
         return f':- determination(face/1, {IsA.name}/2).'
 
 
+@register
 class HasA(Predicate):
     """State that an example has some part"""
 
     type = 'meta'
     name = 'has_a'
+    arity = 2
 
     def calc(identifier, feature):
         return f'{HasA.name}({identifier}, {identifier+str(feature.kind)}).'
@@ -210,10 +378,12 @@ class HasA(Predicate):
         return f':- determination(face/1, {HasA.name}/2).'
 
 
+@register
 class Face(Predicate):
 
     type = 'unariy'
     name = 'face'
+    arity = 1
 
     def calc(identifier):
         return f'face({identifier}).'
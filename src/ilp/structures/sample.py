@@ -1,3 +1,5 @@
+import os
+
 import matplotlib.pyplot as plt
 import matplotlib.image as mpimg
 
@@ -6,6 +8,19 @@ from ilp.structures.feature_type import FeatureType
 
 class Sample():
 
+    __slots__ = ('features', 'ground_truth', 'prediction', 'predicted_class',
+                 'heatmap', 'orig_file')
+
+    # the same for all samples
+    color_map = {
+            FeatureType.left_eye: '#264653',
+            FeatureType.right_eye: '#2a9d8f',
+            FeatureType.nose: '#e9c46a',
+            FeatureType.mouth: '#e76f51',
+            FeatureType.face_frame: '#f4a261',
+            FeatureType.region: '#8ab17d'
+    }
+
     def __init__(self,
                  features,
                  ground_truth,
@@ -20,24 +35,45 @@ class Sample():
         self.predicted_class = predicted_class
         self.heatmap = heatmap
         self.orig_file = orig_file
-        self.color_map = {
-                FeatureType.left_eye: '#264653',
-                FeatureType.right_eye: '#2a9d8f',
-                FeatureType.nose: '#e9c46a',
-                FeatureType.mouth: '#e76f51',
-                FeatureType.face_frame: '#f4a261'
-        }
-
-    def show(self):
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        # pickles of older versions store the __dict__, which also has the
+        #   color map of every sample, or a tuple (None, slot values)
+        if isinstance(state, tuple):
+            state = state[1]
+        for slot in self.__slots__:
+            setattr(self, slot, state[slot])
+
+    @property
+    def name(self):
+        """Filename of the heatmap, used as key for the relevance store"""
+        return os.path.basename(self.heatmap)
+
+    @property
+    def identifier(self):
+        """Name of the example in the aleph files, e.g. pos_neg_pic_00046"""
+        return os.path.splitext(self.name)[0]
+
+    def relevance(self, store):
+        """Return the raw relevance map of the sample from a HeatmapStore"""
+        return store.get(self.name)
+
+    def show(self, store=None):
         # Create figure and axes
         fig, ax = plt.subplots(1)
 
-        heatmap_img = mpimg.imread(self.heatmap)
         orig_img = mpimg.imread(self.orig_file)
 
         # Display the image
         ax.imshow(orig_img)
-        ax.imshow(heatmap_img, alpha=0.8)
+        if store is not None and self.name in store:
+            ax.imshow(self.relevance(store), alpha=0.8,
+                      clim=(-1, 1), cmap='seismic')
+        else:
+            ax.imshow(mpimg.imread(self.heatmap), alpha=0.8)
 
         # Show the features
         for feature in self.features:
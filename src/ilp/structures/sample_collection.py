@@ -0,0 +1,255 @@
+"""Columnar representation of many samples
+
+Instead of one Sample object with Feature objects per annotated heatmap,
+the collection stores the features of all samples in flat arrays:
+
+    bboxes      int16   (n_features, 4)  xmin, ymin, xmax, ymax
+    kinds       uint8   (n_features,)    FeatureType value
+    offsets     int64   (n_samples + 1,) features of sample i are
+                                         offsets[i]:offsets[i+1]
+
+plus one array per sample attribute. SampleView objects give the old
+object interface on top of the arrays. The arrays are saved without
+compression, so a saved collection can be memory mapped and read chunk by
+chunk with take.
+"""
+
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+from ilp.structures.feature import Feature
+from ilp.structures.feature_type import FeatureType
+from ilp.structures.sample import Sample
+
+
+def encode_paths(paths):
+    """Paths as array of utf-8 bytes, 1 instead of 4 bytes per character"""
+    paths = np.asarray(paths)
+    if paths.dtype.kind == 'S':
+        return paths
+    return np.char.encode(paths.astype(str), 'utf-8')
+
+
+def memmap_npz(path, mode='r'):
+    """Memory map the arrays of an .npz file
+
+    np.load reads every array of an archive into memory. Arrays stored
+    without compression are plain .npy files inside the zip file, so they
+    are memory mapped at their offset instead. Compressed arrays, e.g. of
+    files written with savez_compressed, are loaded.
+    """
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            name = os.path.splitext(info.filename)[0]
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+
+            # the local file header ends with the variable length filename
+            #   and extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 \
+                if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+
+            if not np.prod(shape, dtype=np.int64):
+                # empty arrays can not be memory mapped
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode=mode,
+                                         offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+
+    return arrays
+
+
+class SampleCollection():
+
+    def __init__(self, bboxes, kinds, offsets, ground_truth, prediction,
+                 predicted_class, heatmaps, orig_files):
+
+        self.bboxes = np.asarray(bboxes, dtype=np.int16).reshape(-1, 4)
+        self.kinds = np.asarray(kinds, dtype=np.uint8)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.ground_truth = np.asarray(ground_truth, dtype=np.uint8)
+        self.prediction = np.asarray(prediction, dtype=np.float32)
+        self.predicted_class = np.asarray(predicted_class, dtype=np.uint8)
+        self.heatmaps = encode_paths(heatmaps)
+        self.orig_files = encode_paths(orig_files)
+
+    @classmethod
+    def from_samples(cls, samples):
+        """Convert an iterable of Sample objects"""
+
+        bboxes = []
+        kinds = []
+        offsets = [0]
+        ground_truth = []
+        prediction = []
+        predicted_class = []
+        heatmaps = []
+        orig_files = []
+
+        for sample in samples:
+            for feature in sample.features:
+                c = feature.coordinates
+                bboxes.append((c['xmin'], c['ymin'], c['xmax'], c['ymax']))
+                kinds.append(feature.kind.value)
+            offsets.append(len(kinds))
+            ground_truth.append(sample.ground_truth)
+            prediction.append(sample.prediction)
+            predicted_class.append(sample.predicted_class)
+            heatmaps.append(sample.heatmap)
+            orig_files.append(sample.orig_file)
+
+        return cls(bboxes, kinds, offsets, ground_truth, prediction,
+                   predicted_class, heatmaps, orig_files)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """Load a collection written with save
+
+        Parameters
+        ----------
+        mmap_mode : str
+            'r' memory maps the arrays, see memmap_npz, so only the
+            samples taken from the collection are read
+        """
+
+        if mmap_mode is not None:
+            return cls(**memmap_npz(path, mmap_mode))
+
+        with np.load(path) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    def save(self, path):
+        np.savez(path,
+                 bboxes=self.bboxes,
+                 kinds=self.kinds,
+                 offsets=self.offsets,
+                 ground_truth=self.ground_truth,
+                 prediction=self.prediction,
+                 predicted_class=self.predicted_class,
+                 heatmaps=self.heatmaps,
+                 orig_files=self.orig_files)
+
+    def take(self, indices):
+        """New collection with the samples at the given indices"""
+
+        indices = np.asarray(indices, dtype=np.int64)
+        sizes = self.offsets[indices + 1] - self.offsets[indices]
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+        # index of every feature of the selected samples
+        features = (np.repeat(self.offsets[indices] - offsets[:-1], sizes)
+                    + np.arange(offsets[-1]))
+
+        return SampleCollection(self.bboxes[features],
+                                self.kinds[features],
+                                offsets,
+                                self.ground_truth[indices],
+                                self.prediction[indices],
+                                self.predicted_class[indices],
+                                self.heatmaps[indices],
+                                self.orig_files[indices])
+
+    @property
+    def identifiers(self):
+        """Names of the examples in the aleph files"""
+        return [os.path.splitext(os.path.basename(heatmap.decode()))[0]
+                for heatmap in self.heatmaps]
+
+    @property
+    def sample_index(self):
+        """Index of the sample for every feature"""
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError('sample index out of range')
+        return SampleView(self, index % len(self))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield SampleView(self, index)
+
+
+class SampleView():
+    """Lightweight object interface to one sample of a collection"""
+
+    __slots__ = ('collection', 'index')
+
+    def __init__(self, collection, index):
+        self.collection = collection
+        self.index = index
+
+    @property
+    def bboxes(self):
+        c = self.collection
+        return c.bboxes[c.offsets[self.index]:c.offsets[self.index + 1]]
+
+    @property
+    def kinds(self):
+        c = self.collection
+        return c.kinds[c.offsets[self.index]:c.offsets[self.index + 1]]
+
+    @property
+    def features(self):
+        """Feature objects, created on access"""
+        return [Feature({'xmin': int(xmin), 'xmax': int(xmax),
+                         'ymin': int(ymin), 'ymax': int(ymax)},
+                        FeatureType(int(kind)))
+                for (xmin, ymin, xmax, ymax), kind in zip(self.bboxes,
+                                                          self.kinds)]
+
+    @property
+    def ground_truth(self):
+        return int(self.collection.ground_truth[self.index])
+
+    @property
+    def prediction(self):
+        return float(self.collection.prediction[self.index])
+
+    @property
+    def predicted_class(self):
+        return int(self.collection.predicted_class[self.index])
+
+    @property
+    def heatmap(self):
+        return self.collection.heatmaps[self.index].decode()
+
+    @property
+    def orig_file(self):
+        return self.collection.orig_files[self.index].decode()
+
+    @property
+    def name(self):
+        return os.path.basename(self.heatmap)
+
+    @property
+    def identifier(self):
+        return os.path.splitext(self.name)[0]
+
+    def to_sample(self):
+        return Sample(features=self.features,
+                      ground_truth=self.ground_truth,
+                      prediction=self.prediction,
+                      predicted_class=self.predicted_class,
+                      heatmap=self.heatmap,
+                      orig_file=self.orig_file)
+
+    def show(self, store=None):
+        self.to_sample().show(store)
@@ -8,6 +8,8 @@ import keras
 
 class VGGFinetune():
 
+    NEW_LAYERS = 3   # number of newly created layers ontop of the vgg16
+
     def __init__(self, force_new=False):
 
         self.model = self.__create_model()
@@ -60,6 +62,31 @@ class VGGFinetune():
 
         return model
 
+    def base_model(self):
+        """Return the vgg16 base up to block5_pool as a model of its own"""
+        base_output = self.model.layers[-self.NEW_LAYERS - 1].output
+        return keras.models.Model(inputs=self.model.input, outputs=base_output)
+
+    def head_model(self, learning_rate=0.001):
+        """Return the head as a model on the output of the base
+
+        The head shares its layers with the full model, so training the
+        head model trains the head of the full model.
+        """
+        base_output_shape = self.model.layers[-self.NEW_LAYERS - 1].output_shape
+        inputs = keras.Input(shape=base_output_shape[1:])
+
+        outputs = inputs
+        for layer in self.model.layers[-self.NEW_LAYERS:]:
+            outputs = layer(outputs)
+
+        head = keras.models.Model(inputs=inputs, outputs=outputs)
+        head.compile(optimizer=keras.optimizers.Adam(lr=learning_rate),
+                     loss="binary_crossentropy",
+                     metrics=["binary_accuracy"])
+
+        return head
+
     def compile(self, learning_rate=0.001):
         print("[*] Compiling model")
         self.model.compile(optimizer=keras.optimizers.Adam(lr=learning_rate),
@@ -79,11 +106,9 @@ class VGGFinetune():
             Number of base layers to train
         """
 
-        NEW_LAYERS = 3   # number of newly created layers ontop of the vgg16
-
         # The last vgg16 layer is a maxpooling layer, so for one more
         # trainable layer, we need to choose the convolutional layer before
-        stop = n_base_layers + 1 + NEW_LAYERS
+        stop = n_base_layers + 1 + self.NEW_LAYERS
 
         # Set all layers except the last n_base_layers to be non trainable
         for layer in self.model.layers[:-stop]:
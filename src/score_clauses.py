@@ -0,0 +1,41 @@
+""" Score hypotheses on the generated aleph files without prolog
+
+Counts the positive and negative examples covered by each clause, e.g.
+
+    python3 score_clauses.py "face(A) :- has_a(A,C), is_a(C,nose), top_of(C,D)."
+
+The clauses can also be read from a file, e.g. the theory written by aleph.
+"""
+import os
+import argparse
+
+import pandas as pd
+
+import config
+from ilp.coverage import BackgroundKnowledge, parse_clause, parse_clauses
+
+parser = argparse.ArgumentParser(description='Score the coverage of clauses')
+parser.add_argument('clauses', nargs='*',
+                    help='Clauses to score, e.g. "face(A) :- has_a(A,B)."')
+parser.add_argument('--file', default=None, type=str,
+                    help='File with clauses, each ending with a full stop.')
+
+
+if __name__ == "__main__":
+
+    args = parser.parse_args()
+
+    clauses = [parse_clause(clause) for clause in args.clauses]
+    if args.file:
+        with open(args.file) as f:
+            clauses += parse_clauses(f.read())
+
+    aleph_path = os.path.sep.join([config.ilp_path, 'aleph'])
+    print(f'[*] Loading background knowledge from {aleph_path}')
+    knowledge = BackgroundKnowledge.load(aleph_path)
+
+    scores = pd.DataFrame(knowledge.score_all(clauses))
+    with pd.option_context('display.max_colwidth', None,
+                           'display.max_columns', None,
+                           'display.width', None):
+        print(scores)
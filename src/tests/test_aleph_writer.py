@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+
+import config
+from heatmapping.heatmap_store import HeatmapStore
+from ilp.aleph_writer import AlephWriter
+from ilp.structures import predicates
+from ilp.structures.sample_collection import SampleCollection
+
+
+def random_collection(n, seed=0, prefix='pos_pic_'):
+    """Samples with up to six random boxes of the original feature types"""
+
+    random_state = np.random.RandomState(seed)
+    sizes = random_state.randint(0, 7, size=n)
+    xmin, ymin = random_state.randint(0, 200, size=(2, sizes.sum()))
+    width, height = random_state.randint(1, 40, size=(2, sizes.sum()))
+    names = [f'{prefix}{i}.png' for i in range(n)]
+
+    return SampleCollection(
+        np.column_stack([xmin, ymin, xmin + width, ymin + height]),
+        random_state.randint(0, 5, size=sizes.sum()),
+        np.concatenate([[0], np.cumsum(sizes)]),
+        np.ones(n),
+        random_state.rand(n),
+        random_state.randint(0, 2, size=n),
+        ['/h/' + name for name in names],
+        ['/o/' + name for name in names])
+
+
+def read(path):
+    return {filename: open(os.path.join(path, filename)).read()
+            for filename in ['picasso.b', 'picasso.f', 'picasso.n']}
+
+
+def test_incremental_matches_full_write(tmp_path):
+    preds = predicates.load()
+    samples = random_collection(300)
+
+    AlephWriter(str(tmp_path / 'inc'), preds, chunk_size=37) \
+        .write_incremental(samples)
+
+    # change some samples, remove others and add a new one
+    changed = random_collection(300, seed=1)
+    keep = np.flatnonzero(np.arange(300) % 7 != 0)
+    edited = np.arange(300) % 10 == 0
+    samples.bboxes[np.isin(samples.sample_index, np.flatnonzero(edited))] \
+        += 1
+    samples.prediction[edited] = changed.prediction[edited]
+    samples = samples.take(keep)
+
+    AlephWriter(str(tmp_path / 'full'), preds, chunk_size=37).write(samples)
+    AlephWriter(str(tmp_path / 'inc'), preds, chunk_size=37) \
+        .write_incremental(samples)
+
+    assert read(tmp_path / 'inc') == read(tmp_path / 'full')
+    assert len(os.listdir(tmp_path / 'inc' / 'segments')) == len(keep)
+
+
+def test_incremental_rewrites_missing_segments(tmp_path):
+    preds = predicates.load()
+    samples = random_collection(50)
+    writer = AlephWriter(str(tmp_path), preds)
+
+    writer.write_incremental(samples)
+    expected = read(tmp_path)
+    os.remove(writer.segment_path(samples.identifiers[3]))
+    writer.write_incremental(samples)
+
+    assert read(tmp_path) == expected
+
+
+def test_incremental_reformats_on_new_naming(tmp_path, capsys):
+    preds = predicates.load()
+    samples = random_collection(50)
+
+    AlephWriter(str(tmp_path), preds).write_incremental(samples)
+    AlephWriter(str(tmp_path), preds, number_parts=True) \
+        .write_incremental(samples)
+
+    assert 'Formatted 50 new or changed samples' in capsys.readouterr().out
+    AlephWriter(str(tmp_path / 'full'), preds, number_parts=True) \
+        .write(samples)
+    assert read(tmp_path) == read(tmp_path / 'full')
+
+
+def test_incremental_with_relevance_stats(tmp_path):
+    preds = predicates.load(config.aleph_predicates + ['relevant'])
+    samples = random_collection(40)
+
+    store = HeatmapStore(str(tmp_path / 'relevance'))
+    store.create([os.path.basename(h.decode()) for h in samples.heatmaps])
+    store.relevance[:] = np.random.RandomState(0).rand(
+        *store.relevance.shape)
+    store.finish()
+    store = HeatmapStore(str(tmp_path / 'relevance')).open()
+
+    AlephWriter(str(tmp_path / 'full'), preds, heatmaps=store,
+                chunk_size=16).write(samples)
+    AlephWriter(str(tmp_path / 'inc'), preds, heatmaps=store,
+                chunk_size=16).write_incremental(samples)
+
+    background = read(tmp_path / 'full')['picasso.b']
+    assert 'relevant(' in background
+    assert read(tmp_path / 'inc') == read(tmp_path / 'full')
+
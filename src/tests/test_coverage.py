@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+
+from ilp.aleph_writer import AlephWriter
+from ilp.coverage import BackgroundKnowledge, is_variable, parse_clause
+from ilp.structures import predicates
+from tests.test_aleph_writer import random_collection
+
+
+def naive_covered(relations, clause, examples):
+    """Examples covered by a clause, by backtracking over the facts"""
+
+    (_, head), body = parse_clause(clause)
+
+    def satisfiable(literals, binding):
+        if not literals:
+            return True
+        (name, arguments), rest = literals[0], literals[1:]
+        for fact in relations.get((name, len(arguments)), ()):
+            extended = dict(binding)
+            for term, value in zip(arguments, fact):
+                if term == '_':
+                    continue
+                if not is_variable(term):
+                    if term != value:
+                        break
+                elif extended.setdefault(term, value) != value:
+                    break
+            else:
+                if satisfiable(rest, extended):
+                    return True
+        return False
+
+    covered = set()
+    for example in examples:
+        binding = {}
+        for term, value in zip(head, example):
+            if not is_variable(term):
+                if term != value:
+                    break
+            elif binding.setdefault(term, value) != value:
+                break
+        else:
+            if satisfiable(body, binding):
+                covered.add(example)
+
+    return covered
+
+
+def random_relations(seed):
+    random_state = np.random.RandomState(seed)
+    images = [f'img{i}' for i in range(20)]
+    parts = [f'part{i}' for i in range(60)]
+    kinds = ['eye', 'nose', 'mouth']
+
+    def pairs(a, b, n):
+        rows = zip(random_state.randint(len(a), size=n),
+                   random_state.randint(len(b), size=n))
+        return {(a[i], b[j]) for i, j in rows}
+
+    relations = {('has_a', 2): pairs(images, parts, 80),
+                 ('is_a', 2): pairs(parts, kinds, 60),
+                 ('left_of', 2): pairs(parts, parts, 300),
+                 ('overlaps', 2): pairs(parts, parts, 100)}
+    examples = [(image,) for image in images]
+
+    return relations, examples[:12], examples[12:]
+
+
+CLAUSES = [
+    'face(A) :- has_a(A,B).',
+    'face(A) :- has_a(A,B), is_a(B,nose).',
+    'face(A) :- has_a(A,B), is_a(B,beard).',
+    'face(A) :- has_a(A,B), is_a(B,C), has_a(A,D), is_a(D,C), left_of(B,D).',
+    'face(A) :- has_a(A,B), left_of(B,B).',
+    'face(A) :- has_a(A,B), left_of(B,C), left_of(C,D), overlaps(D,B).',
+    'face(A) :- has_a(A,B), is_a(B,eye), has_a(A,C), is_a(C,mouth), '
+    'overlaps(B,C), left_of(C,_).',
+    'face(A) :- has_a(A,_), has_a(A,B), overlaps(B,C), is_a(C,eye).',
+    'face(img3).',
+    'face(A).',
+]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_covered_matches_naive_evaluator(seed):
+    relations, positive, negative = random_relations(seed)
+    background = BackgroundKnowledge(relations, positive, negative)
+
+    for clause in CLAUSES:
+        for examples in (positive, negative):
+            assert background.covered(clause, examples) \
+                == naive_covered(relations, clause, examples), clause
+
+        score = background.score(clause)
+        assert score['positive'] == len(naive_covered(relations, clause,
+                                                      positive))
+
+
+def test_wide_keys_match_naive_evaluator():
+    # 10000 constants, so keys of five columns do not fit into an int64
+    random_state = np.random.RandomState(0)
+    constants = [f'c{i}' for i in range(10000)]
+    facts = {tuple(constants[i] for i in row)
+             for row in random_state.randint(20, size=(400, 5))}
+    relations = {('wide', 5): facts,
+                 ('const', 1): {(c,) for c in constants},
+                 ('first', 2): {(c, fact[0]) for c, fact
+                                in zip(constants, sorted(facts))}}
+    examples = [(c,) for c in constants[:300]]
+    background = BackgroundKnowledge(relations, examples, [])
+
+    assert len(background.names) ** 5 >= 2 ** 62
+    for clause in ['p(A) :- first(A,B), wide(B,C,D,E,F), '
+                   'wide(B,C,D,E,F), wide(B,_,_,_,_).',
+                   'p(A) :- first(A,B), wide(B,C,D,E,F), wide(F,E,D,C,B).',
+                   'p(A) :- first(A,B), wide(B,c1,C,D,E).']:
+        assert background.covered(clause, examples) \
+            == naive_covered(relations, clause, examples), clause
+
+
+@pytest.mark.parametrize('literal', [r'\+ has_a(A,B)', r'A \= B', 'B is 1',
+                                     'B < 3', 'is(B, 1)'])
+def test_builtins_are_not_supported(literal):
+    relations, positive, negative = random_relations(0)
+    background = BackgroundKnowledge(relations, positive, negative)
+
+    with pytest.raises(ValueError):
+        background.score(f'face(A) :- has_a(A,B), {literal}.')
+
+
+@pytest.mark.parametrize('symmetric_facts', ['once', 'rule'])
+def test_load_expands_symmetric_facts(tmp_path, symmetric_facts):
+    preds = predicates.load()
+    samples = random_collection(40)
+    AlephWriter(str(tmp_path / 'both'), preds).write(samples)
+    AlephWriter(str(tmp_path / symmetric_facts), preds,
+                symmetric_facts=symmetric_facts).write(samples)
+
+    both = BackgroundKnowledge.load(str(tmp_path / 'both'))
+    stored = BackgroundKnowledge.load(str(tmp_path / symmetric_facts))
+
+    for name in ['overlaps', 'intersects', 'disjoint']:
+        assert np.array_equal(stored.relations[(name, 2)],
+                              both.relations[(name, 2)])
+        clause = f'face(A) :- has_a(A,B), is_a(B,mouth), {name}(C,B), ' \
+                 'is_a(C,nose).'
+        assert stored.score(clause) == both.score(clause)
@@ -0,0 +1,30 @@
+import numpy as np
+
+from heatmapping.heatmap_store import HeatmapStore
+
+
+def test_store_exists_once_finished(tmp_path):
+    names = ['pos_pos_pic_1.png', 'neg_pos_pic_2.png']
+    store = HeatmapStore(str(tmp_path)).create(names, shape=(4, 4))
+    store.relevance[0] = 1
+    assert not store.exists()
+
+    store.relevance[1] = -1
+    store.finish()
+    assert store.exists()
+
+    # an interrupted rewrite leaves no store behind
+    HeatmapStore(str(tmp_path)).create(names, shape=(4, 4))
+    assert not HeatmapStore(str(tmp_path)).exists()
+
+
+def test_open_reads_the_finished_maps(tmp_path):
+    names = ['pos_pos_pic_1.png', 'neg_pos_pic_2.png']
+    store = HeatmapStore(str(tmp_path)).create(names, shape=(4, 4))
+    store.relevance[:] = np.arange(32).reshape(2, 4, 4)
+    store.finish()
+
+    store = HeatmapStore(str(tmp_path)).open()
+    assert store.filenames == names and 'neg_pos_pic_2.png' in store
+    assert np.array_equal(store.get('neg_pos_pic_2.png'),
+                          np.arange(16, 32).reshape(4, 4))
@@ -0,0 +1,69 @@
+import os
+
+from data_loaders.manifest import DatasetManifest
+
+
+def touch(path, size=1):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+
+
+def dataset(root):
+    for name in ['pos/pic_2.png', 'pos/pic_1.png', 'neg/pic_3.png',
+                 'neg/sub/pic_4.jpg', 'neg/notes.txt', 'pic_0.png']:
+        touch(os.path.join(root, name))
+
+
+def walk(root):
+    """Image files relative to root like the manifest lists them"""
+    files = []
+    for directory, dirs, names in os.walk(root):
+        rel_dir = os.path.relpath(directory, root)
+        files += [name if rel_dir == '.' else os.path.join(rel_dir, name)
+                  for name in names if not name.endswith('.txt')]
+    return sorted(files)
+
+
+def test_files_and_classes(tmp_path):
+    root = str(tmp_path / 'data')
+    dataset(root)
+    manifest = DatasetManifest(str(tmp_path / 'manifest.json'))
+
+    assert sorted(path for path, _ in manifest.files(root)) == walk(root)
+    assert manifest.count(root) == 5
+
+    filenames, labels, class_indices = manifest.classes(root)
+    assert class_indices == {'neg': 0, 'pos': 1}
+    assert filenames == ['neg/pic_3.png', 'neg/sub/pic_4.jpg',
+                         'pos/pic_1.png', 'pos/pic_2.png']
+    assert labels == [0, 0, 1, 1]
+
+
+def test_only_changed_directories_are_scanned(tmp_path, monkeypatch):
+    root = str(tmp_path / 'data')
+    dataset(root)
+    path = str(tmp_path / 'manifest.json')
+    DatasetManifest(path).count(root)
+
+    scanned = []
+    scan = DatasetManifest.scan
+
+    def counting_scan(directory, mtime):
+        scanned.append(os.path.relpath(directory, root))
+        return scan(directory, mtime)
+
+    monkeypatch.setattr(DatasetManifest, 'scan', staticmethod(counting_scan))
+
+    assert DatasetManifest(path).count(root) == 5
+    assert scanned == []
+
+    touch(os.path.join(root, 'pos', 'pic_5.png'))
+    manifest = DatasetManifest(path)
+    assert manifest.count(root) == 6
+    assert scanned == ['pos']
+    assert sorted(path for path, _ in manifest.files(root)) == walk(root)
+
+    # the instance refreshes a directory tree only once
+    manifest.count(root)
+    assert scanned == ['pos']
@@ -0,0 +1,77 @@
+import numpy as np
+
+from heatmapping.proposals import write_voc
+from ilp.parse_annotations import (create_sample, read_annotation,
+                                   read_annotations)
+from ilp.structures.feature_type import FeatureType
+
+
+def write_annotation(path, name, objects, size=None):
+    """VOC xml with (name, xmin, ymin, xmax, ymax) objects"""
+    lines = ['<annotation>', f'<filename>{name}.png</filename>']
+    if size is not None:
+        lines.append(f'<size><width>{size[1]}</width>'
+                     f'<height>{size[0]}</height><depth>3</depth></size>')
+    for kind, xmin, ymin, xmax, ymax in objects:
+        lines.append(f'<object><name>{kind}</name><bndbox>'
+                     f'<xmin>{xmin}</xmin><ymin>{ymin}</ymin>'
+                     f'<xmax>{xmax}</xmax><ymax>{ymax}</ymax>'
+                     '</bndbox></object>')
+    lines.append('</annotation>')
+
+    filepath = str(path / (name + '.xml'))
+    with open(filepath, 'w') as f:
+        f.write('\n'.join(lines))
+    return filepath
+
+
+def test_boxes_are_scaled_to_the_relevance_map(tmp_path):
+    # annotated on the rendered figure, which is larger than the map
+    filepath = write_annotation(tmp_path, 'pos_pos_pic_1',
+                                [('nose', 100, 50, 300, 250),
+                                 ('mouth', 0, 0, 448, 336)],
+                                size=(336, 448))
+
+    assert read_annotation(filepath, size=(224, 224)) == [
+        (FeatureType.nose.value, 50, 33, 150, 167),
+        (FeatureType.mouth.value, 0, 0, 224, 224)]
+
+
+def test_boxes_without_size_are_kept(tmp_path):
+    filepath = write_annotation(tmp_path, 'pos_pos_pic_1',
+                                [('left_eye', 10, 20, 30, 40)])
+
+    assert read_annotation(filepath) == [
+        (FeatureType.left_eye.value, 10, 20, 30, 40)]
+
+
+def test_proposals_read_back_unchanged(tmp_path):
+    boxes = np.array([[3, 4, 50, 60], [100, 120, 224, 200]])
+    write_voc(str(tmp_path), 'neg_pos_pic_7.png', boxes, (224, 224))
+
+    objects = read_annotation(str(tmp_path / 'neg_pos_pic_7.xml'))
+    assert objects == [(FeatureType.region.value,) + tuple(box)
+                       for box in boxes.tolist()]
+
+
+def test_parallel_reading_keeps_the_order(tmp_path):
+    filepaths = [write_annotation(tmp_path, f'pos_pos_pic_{i}',
+                                  [('nose', i, i, i + 5, i + 5)])
+                 for i in range(20)]
+
+    serial = list(read_annotations(filepaths, processes=1))
+    assert list(read_annotations(filepaths, processes=2, chunksize=3)) \
+        == serial
+    assert [objects[0][1] for objects in serial] == list(range(20))
+
+
+def test_create_sample_from_records():
+    meta = {'ground_truth': 1, 'prediction': 0.75, 'predicted_class': 1}
+    sample = create_sample([(FeatureType.nose.value, 1, 2, 3, 4)],
+                           '/h/pos_pos_pic_1.png', '/o/pos/pic_1.png', meta)
+
+    assert sample.identifier == 'pos_pos_pic_1'
+    assert sample.prediction == 0.75
+    assert sample.features[0].kind == FeatureType.nose
+    assert sample.features[0].coordinates == {'xmin': 1, 'ymin': 2,
+                                              'xmax': 3, 'ymax': 4}
@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+import pytest
+
+from heatmapping import proposals
+
+
+def random_maps(n, seed=0):
+    """Blobs of relevance with noise, some touching the edges of the map"""
+
+    random_state = np.random.RandomState(seed)
+    yy, xx = np.mgrid[:64, :64]
+    maps = random_state.normal(scale=0.02, size=(n, 64, 64))
+    for i in range(n):
+        for _ in range(random_state.randint(0, 6)):
+            cy, cx = random_state.randint(-5, 69, size=2)
+            radius = random_state.randint(2, 10)
+            maps[i] += (np.exp(-((yy - cy)**2 + (xx - cx)**2)
+                               / (2 * radius**2)) * random_state.rand())
+
+    return maps.astype(np.float32)
+
+
+def label_each(masks, kernel_size, min_area):
+    """Label every mask on its own with the default border of OpenCV"""
+
+    regions = []
+    for i, mask in enumerate(masks):
+        if kernel_size > 1:
+            kernel = np.ones((kernel_size, kernel_size), dtype=np.uint8)
+            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask,
+                                                          connectivity=8)
+        for x, y, w, h, area in stats[1:]:
+            if area >= min_area:
+                regions.append((i, (x, y, x + w, y + h), area))
+
+    return sorted(regions)
+
+
+@pytest.mark.parametrize('kernel_size', [0, 3, 5])
+def test_label_regions_matches_single_maps(kernel_size):
+    masks = proposals.threshold_maps(random_maps(40), 0.3)
+    # regions at the edges, where the border handling matters
+    masks[0] = 0
+    masks[0, 2, [0, 4]] = 1
+    masks[0, 0, :] = 1
+
+    images, boxes, areas = proposals.label_regions(masks, kernel_size, 4)
+    regions = sorted(zip(images.tolist(), map(tuple, boxes.tolist()),
+                         areas.tolist()))
+
+    assert regions == label_each(masks, kernel_size, 4)
+
+
+def test_propose_orders_regions_by_area():
+    maps = np.zeros((3, 32, 32), dtype=np.float32)
+    maps[0, 2:6, 2:6] = 1
+    maps[0, 20:30, 20:30] = 1
+    # no positive relevance
+    maps[1] = -1
+
+    boxes = proposals.propose(maps, kernel_size=0, min_area=1)
+
+    assert len(boxes) == 3
+    assert boxes[0].tolist() == [[20, 20, 30, 30], [2, 2, 6, 6]]
+    assert len(boxes[1]) == 0 and len(boxes[2]) == 0
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from ilp import relations
+from ilp.structures import predicates
+from ilp.structures.feature import Feature
+from ilp.structures.feature_type import FeatureType
+
+
+def random_boxes(n, seed=0):
+    """Boxes with a positive area on a small grid, so edges often touch,
+    boxes contain each other or are identical"""
+
+    random_state = np.random.RandomState(seed)
+    xmin, ymin = random_state.randint(0, 20, size=(2, n))
+    width, height = random_state.randint(1, 12, size=(2, n))
+    return np.column_stack([xmin, ymin, xmin + width, ymin + height])
+
+
+def feature(box):
+    xmin, ymin, xmax, ymax = (int(value) for value in box)
+    return Feature({'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax},
+                   FeatureType.nose)
+
+
+BINARY = [pred for pred in predicates.REGISTRY.values()
+          if pred.type == 'binary']
+
+
+@pytest.mark.parametrize('pred', BINARY, ids=lambda pred: pred.name)
+def test_kernels_match_shapely(pred):
+    boxes = random_boxes(60)
+    features = [feature(box) for box in boxes]
+
+    a, b = np.meshgrid(np.arange(len(boxes)), np.arange(len(boxes)),
+                       indexing='ij')
+    a, b = a.ravel(), b.ravel()
+    holds = pred.kernel(boxes[a], boxes[b])
+    expected = [pred.calc(features[i], features[j], 'x') is not None
+                for i, j in zip(a, b)]
+
+    assert holds.tolist() == expected
+
+
+def test_pairs_of_each_sample():
+    offsets = np.array([0, 3, 3, 4, 8])
+    a, b, pair_offsets = relations.pairs(offsets)
+
+    expected = [(i, j) for start, stop in zip(offsets[:-1], offsets[1:])
+                for i in range(start, stop) for j in range(start, stop)
+                if i != j]
+    assert list(zip(a, b)) == expected
+    assert pair_offsets.tolist() == [0, 6, 6, 6, 18]
+
+    reverse = relations.reverse_pairs(a, b, offsets, pair_offsets)
+    assert np.array_equal(a[reverse], b)
+    assert np.array_equal(b[reverse], a)
+
+
+def test_pair_relations_mirror_symmetric_predicates():
+    boxes = random_boxes(50, seed=1)
+    offsets = np.array([0, 6, 6, 7, 20, 50])
+    kernels = predicates.kernels(BINARY)
+    symmetric = [pred.name for pred in BINARY if pred.symmetric]
+
+    a, b, pair_offsets, holds = relations.pair_relations(
+        boxes, offsets, kernels, symmetric)
+
+    for start, stop, pair_start in zip(offsets[:-1], offsets[1:],
+                                       pair_offsets):
+        matrices = relations.relation_matrices(boxes[start:stop], kernels)
+        n_pairs = (stop - start) * (stop - start - 1)
+        pairs = slice(pair_start, pair_start + n_pairs)
+        for name, matrix in matrices.items():
+            assert np.array_equal(
+                holds[name][pairs],
+                matrix[a[pairs] - start, b[pairs] - start]), name
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+
+from heatmapping.heatmap_store import HeatmapStore
+from ilp.relevance_stats import STATS, relevance_stats
+from tests.test_aleph_writer import random_collection
+
+
+def test_relevance_stats_match_slices(tmp_path):
+    samples = random_collection(30)
+    # boxes reaching over the map and an empty box
+    samples.bboxes[0] = [210, 210, 260, 240]
+    samples.bboxes[1] = [10, 10, 10, 30]
+
+    store = HeatmapStore(str(tmp_path))
+    store.create([os.path.basename(h.decode()) for h in samples.heatmaps])
+    store.relevance[:] = np.random.RandomState(0).randn(
+        *store.relevance.shape)
+    store.relevance[3] = 0
+    store.finish()
+    store = HeatmapStore(str(tmp_path)).open()
+
+    stats = relevance_stats(samples, store, chunk_size=7)
+    assert set(stats) == set(STATS)
+
+    for feature, (xmin, ymin, xmax, ymax) in enumerate(samples.bboxes):
+        relevance = store.relevance[samples.sample_index[feature]]
+        box = relevance[ymin:ymax, xmin:xmax]
+        positive = np.maximum(box, 0).sum()
+        total = relevance.sum()
+        positive_total = np.maximum(relevance, 0).sum()
+
+        np.testing.assert_allclose(stats['sum'][feature], box.sum(),
+                                   rtol=1e-4, atol=1e-3)
+        np.testing.assert_allclose(stats['positive'][feature], positive,
+                                   rtol=1e-4, atol=1e-3)
+        np.testing.assert_allclose(stats['negative'][feature],
+                                   positive - box.sum(), rtol=1e-4, atol=1e-3)
+        np.testing.assert_allclose(stats['share'][feature],
+                                   box.sum() / total if total else 0,
+                                   rtol=1e-3, atol=1e-4)
+        np.testing.assert_allclose(
+            stats['positive_share'][feature],
+            positive / positive_total if positive_total else 0,
+            rtol=1e-4, atol=1e-6)
+        if box.size:
+            np.testing.assert_allclose(stats['max'][feature], box.max())
+            np.testing.assert_allclose(stats['mean'][feature], box.mean(),
+                                       rtol=1e-4, atol=1e-5)
+        else:
+            assert np.isnan(stats['max'][feature])
@@ -0,0 +1,63 @@
+import numpy as np
+
+from ilp.aleph_writer import AlephWriter
+from ilp.structures import predicates
+from ilp.structures.sample_collection import SampleCollection
+from tests.test_aleph_writer import random_collection, read
+
+FIELDS = ['bboxes', 'kinds', 'offsets', 'ground_truth', 'prediction',
+          'predicted_class', 'heatmaps', 'orig_files']
+
+
+def assert_equal(a, b):
+    for field in FIELDS:
+        assert np.array_equal(getattr(a, field), getattr(b, field)), field
+
+
+def is_mapped(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+def test_memory_mapped_collection(tmp_path):
+    samples = random_collection(200)
+    path = str(tmp_path / 'samples.npz')
+    samples.save(path)
+
+    loaded = SampleCollection.load(path, mmap_mode='r')
+    assert all(is_mapped(getattr(loaded, field)) for field in FIELDS)
+    assert_equal(loaded, samples)
+    assert_equal(SampleCollection.load(path), samples)
+
+    indices = [5, 0, 199, 17]
+    assert_equal(loaded.take(indices), samples.take(indices))
+
+
+def test_compressed_and_empty_collections_load(tmp_path):
+    samples = random_collection(30)
+    path = str(tmp_path / 'compressed.npz')
+    np.savez_compressed(path, **{field: getattr(samples, field)
+                                 for field in FIELDS})
+    assert_equal(SampleCollection.load(path, mmap_mode='r'), samples)
+
+    empty = random_collection(0)
+    path = str(tmp_path / 'empty.npz')
+    empty.save(path)
+    assert len(SampleCollection.load(path, mmap_mode='r')) == 0
+
+
+def test_writer_reads_the_memory_mapped_collection(tmp_path):
+    preds = predicates.load()
+    samples = random_collection(120)
+    path = str(tmp_path / 'samples.npz')
+    samples.save(path)
+
+    AlephWriter(str(tmp_path / 'memory'), preds, chunk_size=16) \
+        .write(samples)
+    AlephWriter(str(tmp_path / 'mapped'), preds, chunk_size=16) \
+        .write(SampleCollection.load(path, mmap_mode='r'))
+
+    assert read(tmp_path / 'mapped') == read(tmp_path / 'memory')
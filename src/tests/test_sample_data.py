@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ilp.sample_data import pick_images, select, top_k
+
+
+def test_top_k_matches_sorting():
+    values = np.random.RandomState(0).rand(1000).round(2)
+    for k in [0, 1, 10, 999, 1000, 2000]:
+        expected = np.argsort(values, kind='stable')[:k]
+        assert np.array_equal(values[top_k(values, k)], values[expected])
+
+
+def test_boundary_selects_the_least_confident():
+    predictions = np.random.RandomState(1).rand(500)
+    selected = select(predictions, 20, 'boundary')
+
+    confidence = np.abs(predictions - 0.5)
+    assert len(set(selected)) == 20
+    assert confidence[selected].max() <= np.sort(confidence)[19]
+
+
+def test_random_is_reproducible():
+    predictions = np.random.RandomState(2).rand(100)
+    selected = select(predictions, 30, 'random', seed=3)
+
+    assert len(set(selected)) == 30
+    assert np.array_equal(selected, select(predictions, 30, 'random',
+                                           seed=3))
+
+
+def test_stratified_takes_every_bin():
+    predictions = np.random.RandomState(4).rand(1000)
+    selected = select(predictions, 50, 'stratified', bins=5)
+
+    confidence = np.abs(predictions[selected] - 0.5)
+    bins = np.minimum((confidence * 10).astype(int), 4)
+    assert len(set(selected)) == 50
+    assert np.bincount(bins, minlength=5).tolist() == [10] * 5
+
+
+def test_stratified_fills_up_from_other_bins():
+    # only very confident predictions besides 3 uncertain ones
+    predictions = np.concatenate([np.full(3, 0.5), np.linspace(0, 0.05, 40)])
+    selected = select(predictions, 20, 'stratified', bins=5)
+
+    assert len(set(selected)) == 20
+    assert {0, 1, 2} <= set(selected)
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        select(np.zeros(3), 1, 'closest')
+
+
+def test_pick_images_orders_the_classes():
+    random_state = np.random.RandomState(5)
+    predictions = random_state.rand(200)
+    df = pd.DataFrame({'filename': [f'pos/pic_{i}.png' for i in range(200)],
+                       'ground_truth': random_state.randint(0, 2, 200),
+                       'prediction': predictions,
+                       'predicted_class': np.rint(predictions).astype(int)})
+
+    positive, negative, false_positive, false_negative = pick_images(
+        df, n=20, only_correct=True)
+
+    assert len(positive) == len(negative) == 20
+    assert (positive['predicted_class'] == positive['ground_truth']).all()
+    assert (negative['predicted_class'] == 0).all()
+    assert positive['prediction'].is_monotonic_increasing
+    assert negative['prediction'].is_monotonic_decreasing
+    assert len(false_positive) == ((df['predicted_class'] == 1)
+                                   & (df['ground_truth'] == 0)).sum()
@@ -0,0 +1,90 @@
+import os
+import pickle
+
+from ilp.sample_store import SampleStore
+from ilp.structures.feature import Feature
+from ilp.structures.feature_type import FeatureType
+from ilp.structures.sample import Sample
+
+
+def sample(i):
+    feature = Feature({'xmin': i, 'ymin': 1, 'xmax': i + 10, 'ymax': 20},
+                      FeatureType.mouth)
+    return Sample([feature], 1, 0.5 + i / 100, 1,
+                  f'/h/pos_pos_pic_{i}.png', f'/o/pos/pic_{i}.png')
+
+
+def keys(samples):
+    return [s.heatmap for s in samples]
+
+
+def test_resume_after_close(tmp_path):
+    path = str(tmp_path / 'samples')
+    with SampleStore(path).open() as store:
+        for i in range(3):
+            store.append(f'k{i}', sample(i))
+
+    store = SampleStore(path).open()
+    assert len(store) == 3 and 'k1' in store
+    store.append('k3', sample(3))
+    store.close()
+
+    store = SampleStore(path)
+    assert keys(store) == keys(sample(i) for i in range(4))
+    assert store.get('k2').features[0].coordinates['xmin'] == 2
+
+
+def test_last_sample_of_a_key_counts(tmp_path):
+    path = str(tmp_path / 'samples')
+    with SampleStore(path).open() as store:
+        store.append('a', sample(0))
+        store.append('b', sample(1))
+        store.append('a', sample(2))
+
+    store = SampleStore(path)
+    assert keys(store) == keys([sample(1), sample(2)])
+    assert store.get('a').prediction == sample(2).prediction
+
+
+def test_interrupted_record_is_removed(tmp_path):
+    path = str(tmp_path / 'samples')
+    store = SampleStore(path).open()
+    for i in range(3):
+        store.append(f'k{i}', sample(i))
+    store.checkpoint()
+    store.append('k3', sample(3))
+    store.file.close()
+
+    # cut the last record in half, as if the run had been interrupted
+    size = os.path.getsize(path + '.records')
+    with open(path + '.records', 'r+b') as f:
+        f.truncate(size - 20)
+
+    store = SampleStore(path).open()
+    assert sorted(store.index) == ['k0', 'k1', 'k2']
+    store.append('k3', sample(3))
+    store.close()
+
+    assert keys(SampleStore(path)) == keys(sample(i) for i in range(4))
+
+
+def test_reset_removes_stored_samples(tmp_path):
+    path = str(tmp_path / 'samples')
+    with SampleStore(path).open() as store:
+        store.append('a', sample(0))
+
+    with SampleStore(path).open(reset=True) as store:
+        assert len(store) == 0
+        store.append('b', sample(1))
+
+    assert list(SampleStore(path).load_index()) == ['b']
+
+
+def test_samples_pickle_without_polygons(tmp_path):
+    stored = sample(4)
+    stored.features[0].polygon
+    loaded = pickle.loads(pickle.dumps(stored, pickle.HIGHEST_PROTOCOL))
+
+    assert loaded.features[0]._polygon is None
+    assert loaded.features[0].polygon.bounds == (4.0, 1.0, 14.0, 20.0)
+    assert loaded.heatmap == stored.heatmap
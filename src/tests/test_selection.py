@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from data_loaders.selection import Selection
+
+
+def test_set_save_and_load(tmp_path):
+    source = str(tmp_path / 'test')
+    path = str(tmp_path / 'ilp' / 'selection.json')
+
+    selection = Selection(path)
+    selection.set((['pos/pic_2.png', 'neg/pic_1.png'], ['neg/pic_3.png']),
+                  ['pos', 'neg'], source)
+    selection.save()
+
+    loaded = Selection(path)
+    assert loaded.count() == 3
+    filenames, labels, class_indices, paths = loaded.classes()
+    assert class_indices == {'neg': 0, 'pos': 1}
+    assert filenames == ['neg/neg_pic_3.png', 'pos/neg_pic_1.png',
+                         'pos/pos_pic_2.png']
+    assert labels == [0, 1, 1]
+    assert paths == [os.path.join(source, 'neg/pic_3.png'),
+                     os.path.join(source, 'neg/pic_1.png'),
+                     os.path.join(source, 'pos/pic_2.png')]
+
+
+def test_missing_selection_is_empty(tmp_path):
+    assert Selection(str(tmp_path / 'selection.json')).count() == 0
+
+
+@pytest.mark.parametrize('mode', ['hardlink', 'symlink', 'copy'])
+def test_link_fills_the_class_folders(tmp_path, mode):
+    source = tmp_path / 'test'
+    for name in ['pos/pic_1.png', 'neg/pic_2.png']:
+        os.makedirs(source / os.path.dirname(name), exist_ok=True)
+        (source / name).write_bytes(name.encode())
+
+    selection = Selection(str(tmp_path / 'selection.json'))
+    selection.set((['pos/pic_1.png'], ['neg/pic_2.png']), ['pos', 'fn'],
+                  str(source))
+    images = tmp_path / 'images'
+    selection.link(str(images), mode)
+    # linking again replaces the existing files
+    selection.link(str(images), mode)
+
+    assert (images / 'pos' / 'pos_pic_1.png').read_bytes() \
+        == b'pos/pic_1.png'
+    assert (images / 'fn' / 'neg_pic_2.png').read_bytes() \
+        == b'neg/pic_2.png'
+    assert (images / 'pos' / 'pos_pic_1.png').is_symlink() \
+        == (mode == 'symlink')
+
+
+def test_link_rejects_the_manifest_mode(tmp_path):
+    with pytest.raises(ValueError):
+        Selection(str(tmp_path / 'selection.json')).link(str(tmp_path),
+                                                         'manifest')
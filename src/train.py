@@ -18,14 +18,22 @@ parser.add_argument('--epochs', default=1, type=int,
 parser.add_argument('--base_layers', default=0, type=int,
                     help='Number of layers of the pretrained network to unfreeze')
 
+parser.add_argument('--cache_features', action='store_true',
+                    help='Train only the head on cached features of the frozen \
+                        base, requires base_layers 0. No augmentation is used')
+
 
 
 if __name__ == "__main__":
 
     args = parser.parse_args()
+    if args.cache_features and args.base_layers != 0:
+        parser.error('--cache_features requires --base_layers 0, the '
+                     'features of unfrozen layers change during training')
 
     # Tensorflow flow_from_directory for the picasso dataset with generators
-    training, validation, test, info = PicassoLoader().get_data_flows()
+    loader = PicassoLoader()
+    training, validation, test, info = loader.get_data_flows()
 
     # Warm up" the newly created head of the network
     print('[*] Training: Warming up head')
@@ -39,4 +47,8 @@ if __name__ == "__main__":
                         info=info)
 
     # Start the actual finetuning
-    histroy = trainer.train(epochs=args.epochs, n_base_layers=args.base_layers)
+    if args.cache_features:
+        histroy = trainer.train_head(epochs=args.epochs,
+                                     training=loader.get_feature_flow())
+    else:
+        histroy = trainer.train(epochs=args.epochs, n_base_layers=args.base_layers)
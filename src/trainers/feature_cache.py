@@ -0,0 +1,124 @@
+"""Cache the output of the frozen convolutional base
+
+While only the head of the model is trained, the output of the frozen
+base is the same for an image in every epoch. The features are computed
+once, stored in a memory mapped array and the head is trained on them.
+They are computed again as soon as an image is added, removed or changed,
+which is detected from the size and modification time of the files, or
+the weights of the base change, e.g. after fine tuning base layers.
+"""
+
+import os
+import json
+import hashlib
+
+import numpy as np
+from tqdm import tqdm
+
+
+class FeatureCache():
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : str
+            Directory to store the features in
+        """
+        self.path = path
+
+    def paths(self, name):
+        """Paths of the features, labels and filename index of a dataset"""
+        base = os.path.sep.join([self.path, name])
+        return base + '_features.npy', base + '_labels.npy', base + '_index.json'
+
+    @staticmethod
+    def fingerprint(flow, base_model):
+        """Hash of the weights of the base and filename, size and
+        modification time of every image of a flow"""
+
+        digest = hashlib.sha1()
+        for weights in base_model.get_weights():
+            digest.update(np.ascontiguousarray(weights).tobytes())
+
+        files = []
+        for filename, path in zip(flow.filenames, flow.filepaths):
+            stat = os.stat(path)
+            files.append([filename, stat.st_size, stat.st_mtime_ns])
+
+        return {'weights': digest.hexdigest(), 'files': files}
+
+    def load(self, name, fingerprint):
+        """Memory map the cached features of a dataset
+
+        Returns None if there are no features or they were computed for
+        other files or base weights, see fingerprint.
+        """
+
+        features_path, labels_path, index_path = self.paths(name)
+        try:
+            with open(index_path) as f:
+                if json.load(f) != fingerprint:
+                    return None
+            features = np.load(features_path, mmap_mode='r')
+            labels = np.load(labels_path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+        return features, labels
+
+    def compute(self, name, base_model, flow, fingerprint):
+        """Predict the features of every image of an unshuffled flow and
+        write them to the cache batch by batch"""
+
+        os.makedirs(self.path, exist_ok=True)
+        features_path, labels_path, index_path = self.paths(name)
+
+        shape = (flow.samples,) + tuple(base_model.output_shape[1:])
+        features = np.lib.format.open_memmap(features_path,
+                                             mode='w+',
+                                             dtype=np.float32,
+                                             shape=shape)
+        labels = np.empty(flow.samples, dtype=np.float32)
+
+        print(f'[*] Computing {name} features {shape}')
+        flow.reset()
+        start = 0
+        for i in tqdm(range(int(np.ceil(flow.samples / flow.batch_size)))):
+            x, y = flow.next()
+            stop = min(start + len(x), flow.samples)
+            features[start:stop] = base_model.predict_on_batch(x[:stop - start])
+            labels[start:stop] = y[:stop - start]
+            start = stop
+        flow.reset()
+
+        features.flush()
+        np.save(labels_path, labels)
+
+        # the index is written last, so it only exists for complete features
+        with open(index_path, 'w') as f:
+            json.dump(fingerprint, f)
+
+        return np.load(features_path, mmap_mode='r'), labels
+
+    def get(self, name, base_model, flow):
+        """Load the features of a flow or compute them if not cached
+
+        Returns
+        -------
+        features, labels : numpy.ndarray
+            Memory mapped features and labels in the order of flow.filenames
+        """
+
+        fingerprint = self.fingerprint(flow, base_model)
+        cached = self.load(name, fingerprint)
+        if cached is not None:
+            print(f'[+] Loaded cached {name} features')
+            return cached
+
+        # remove the index before overwriting the features
+        index_path = self.paths(name)[2]
+        if os.path.isfile(index_path):
+            os.remove(index_path)
+
+        return self.compute(name, base_model, flow, fingerprint)
@@ -3,6 +3,8 @@ from datetime import datetime
 
 from keras.callbacks import ModelCheckpoint, TensorBoard
 
+from trainers.feature_cache import FeatureCache
+
 
 class VGGTrainer():
 
@@ -61,9 +63,18 @@ class VGGTrainer():
             self.training,
             validation_data = self.validation,
             epochs=epochs,
-            steps_per_epoch= self.info['n_train'] // self.config.batch_size,
-            validation_steps = self.info['n_validation'] // self.config.batch_size,
+            # every image once per epoch, including the last partial batch
+            steps_per_epoch=len(self.training),
+            validation_steps=len(self.validation),
             callbacks=self.callbacks,
+            # augment the batches in worker threads with a bounded queue,
+            #   forking would copy the initialized tensorflow session
+            workers=self.config.train_workers,
+            use_multiprocessing=False,
+            max_queue_size=self.config.max_queue_size,
+            # the sequences shuffle each epoch from config.seed, keras
+            #   would reorder the batches with the unseeded global random
+            shuffle=False,
         )
 
         self.histories.append(history)
@@ -76,3 +87,49 @@ class VGGTrainer():
         self.validation.reset()
 
         return history
+
+    def train_head(self, epochs, training):
+        """ Train only the head on cached features of the frozen base
+
+        The features of the training and validation images are computed
+        once and reused in every epoch, so no augmentation is applied.
+
+        Parameters
+        -----------
+        epochs : int
+             Number of epochs to train the head for.
+        training : generator
+            Unshuffled flow of the training images without augmentation
+        """
+
+        self.vgg.set_trainable(0)
+
+        cache = FeatureCache(self.config.feature_cache_path)
+        base = self.vgg.base_model()
+        train_features, train_labels = cache.get('train', base, training)
+        val_features, val_labels = cache.get('validation', base,
+                                             self.validation)
+
+        print('[*] Started training on cached features')
+
+        # the checkpoint would only store the head, so it is left out
+        callbacks = [c for c in self.callbacks if isinstance(c, TensorBoard)]
+
+        head = self.vgg.head_model()
+        history = head.fit(
+            train_features,
+            train_labels,
+            batch_size=self.config.batch_size,
+            validation_data=(val_features, val_labels),
+            epochs=epochs,
+            callbacks=callbacks,
+        )
+
+        self.histories.append(history)
+
+        # The head shares its layers with the full model
+        self.vgg.model.save(self.config.vgg_path)
+
+        self.validation.reset()
+
+        return history